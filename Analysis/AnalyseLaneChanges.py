@@ -13,6 +13,7 @@ import numpy as np
 import pandas as pd
 from matplotlib.lines import Line2D
 
+from Analysis.DataReader import data_exists, read_data
 from Analysis.OpenSimulation import open_simulation
 
 
@@ -20,7 +21,7 @@ def analyse_lane_changes(
     show: bool, ask_save: bool, simulations: list[tuple[str, str, dict[str, Any]]] | None
 ):
     """
-    Analyse the data from the simulations provided in the list.
+    Analyse the lane change events of the simulations provided in the list.
     If no list is given, ask for a folder with simulation results.
     Plots the data in two graphs:
     - Amount of lane changes over time of the different simulations in the list
@@ -36,36 +37,45 @@ def analyse_lane_changes(
         simulations = []
         folder_list = [f.path for f in os.scandir(folder) if f.is_dir()]
         for folder in folder_list:
-            simulations.append(open_simulation(preference_file="vehicle_data.csv"))
+            simulations.append(open_simulation(preference_file="lane_changes.csv"))
 
     ##################################
 
     print("Reading data...")
 
-    # Read the data from the file, ignore the first row which is a header
-
+    # Read the lane change events of every simulation, a simulation can have no lane changes
     data = {}
-    for simulation in simulations:
-        data[simulation[1]] = pd.read_csv(simulation[0], header=0)
-
-        # Check if data is empty if so raise an error
-        if len(data[simulation[1]]) == 0:
-            raise ValueError(f"Data {data[simulation[1]]} is empty.")
+    settings = {}
+    for _, project_folder, simulation_settings in simulations:
+        data[project_folder] = read_lane_change_events(project_folder)
+        settings[project_folder] = simulation_settings
 
     ##################################
 
     print("Analysing data...")
 
-    # First create a list with the unique time values
-    time_values = []
-    for simulation in simulations:
-        time_values.append(data[simulation[1]]["time"].unique())
-    time_values = list(set(np.concatenate(time_values)))
+    # The time values of all time steps of the longest simulation
+    time_step = min(settings[simulation]["simulation"]["time_step"] for simulation in settings)
+    steps = max(
+        round(
+            get_steps(settings[simulation])
+            * settings[simulation]["simulation"]["time_step"]
+            / time_step
+        )
+        for simulation in settings
+    )
+    time_values = np.arange(steps) * time_step
 
-    # Create a list per simulation for the lane changes
-    # If a simulation does not have a lane change for a certain time value, add None
+    # Count the lane changes per time step of every simulation
     lane_changes = create_lane_change_dataframe(time_values, data)
 
+    for simulation in data:
+        overtakes = int(data[simulation]["overtake"].sum())
+        print(
+            f"{simulation}: {overtakes} overtakes, "
+            f"{len(data[simulation]) - overtakes} returns to the lane below"
+        )
+
     # Calculate the average amount of lane changes per time step
     average_lane_changes = get_average_lane_changes(lane_changes)
 
@@ -76,58 +86,81 @@ def analyse_lane_changes(
     plot_lane_change_results(show, ask_save, time_values, lane_changes, average_lane_changes)
 
 
+def read_lane_change_events(folder: str) -> pd.DataFrame:
+    """
+    Read the time and the overtake column of the lane change events of a simulation.
+    Simulations without lane_changes.csv (from before the events were recorded) get their
+    events from the vehicle data: a vehicle changed lanes at the time of the first row in its
+    new lane. Changes that no row shows, e.g. between the rows a recording policy keeps or
+    in the last step of a vehicle, are missed, so these counts are a lower bound.
+    """
+    events_path = os.path.join(folder, "lane_changes.csv")
+    if data_exists(events_path):
+        return read_data(events_path, columns=["time", "overtake"])
+
+    vehicle_data_path = os.path.join(folder, "vehicle_data.csv")
+    if not data_exists(vehicle_data_path):
+        raise FileNotFoundError(
+            f"The simulation in {folder} has no lane change events and no vehicle data."
+        )
+
+    print(f"No lane change events in {folder}, using the vehicle data...")
+    vehicle_data = read_data(vehicle_data_path, columns=["time", "vehicle_id", "lane_index"])
+    # A lane index of -1 means the lane is unknown
+    vehicle_data = vehicle_data[vehicle_data["lane_index"] >= 0]
+    vehicle_data = vehicle_data.sort_values(["vehicle_id", "time"], kind="stable")
+
+    vehicle_ids = vehicle_data["vehicle_id"].to_numpy()
+    lanes = vehicle_data["lane_index"].to_numpy()
+    changed = (vehicle_ids[1:] == vehicle_ids[:-1]) & (lanes[1:] != lanes[:-1])
+
+    return pd.DataFrame(
+        {
+            "time": vehicle_data["time"].to_numpy()[1:][changed],
+            "overtake": lanes[1:][changed] > lanes[:-1][changed],
+        }
+    )
+
+
+def get_steps(simulation_settings: dict[str, Any]) -> int:
+    """
+    Return the number of time steps of a simulation,
+    from its duration if the settings have no process information.
+    """
+    if "process" in simulation_settings:
+        return simulation_settings["process"]["steps"]
+    return int(
+        simulation_settings["simulation"]["duration"]
+        / simulation_settings["simulation"]["time_step"]
+    )
+
+
 def create_lane_change_dataframe(
-    time_values: list, data: dict[str, pd.DataFrame]
-) -> dict[str, list]:
+    time_values: np.ndarray, data: dict[str, pd.DataFrame]
+) -> dict[str, np.ndarray]:
     """
-    Create a column to the data with the lane change of the vehicle.
+    Count the lane changes per time value of every simulation.
     """
-    # Create a list per simulation for the lane changes
-    # If a simulation does not have a lane change for a certain time value, add None
     lane_changes = {}
     for simulation in data:
-        lane_changes[simulation[1]] = return_lane_changes_list(time_values, data[simulation])
+        lane_changes[simulation] = return_lane_changes_list(time_values, data[simulation])
 
     return lane_changes
 
 
-def return_lane_changes_list(time_values: list, data: pd.DataFrame) -> list:
+def return_lane_changes_list(time_values: np.ndarray, data: pd.DataFrame) -> np.ndarray:
     """
-    Create a column to the data with the lane change of the vehicle.
+    Count the lane change events per time value, the time values are evenly spaced.
     """
-    # Create a list per simulation for the lane changes
-    # If a simulation does not have a lane change for a certain time value, add None
-    lane_changes = []
-    for i, time_value in enumerate(time_values):
-        if not (time_value in data["time"].values):
-            # If the time value is not in the data, add None
-            lane_changes.append(None)
-            continue
-
-        # Amount of lane changes is the amount of vehicles that changed lanes in the last time step
-        # If a vehicle is not present at the last time step, it is not counted as a lane change
-
-        lane_changes_per_time_step = 0
-        for vehicle in data[data["time"] == time_value]["vehicle_id"].values:
-            # Check if the vehicle was present in the previous time step
-            if not vehicle in data[data["time"] == time_values[i - 1]]["vehicle_id"].values:
-                continue
-
-            # Check if the vehicle changed lanes
-            if not (
-                data[(data["time"] == time_value) & (data["vehicle_id"] == vehicle)][
-                    "lane_index"
-                ].values[0]
-                == data[(data["time"] == time_values[i - 1]) & (data["vehicle_id"] == vehicle)][
-                    "lane_index"
-                ].values[0]
-            ):
-                lane_changes_per_time_step += 1
+    # Map the time of every event to its time step,
+    # rounding makes this robust against the rounding of the time in the data file
+    time_step = time_values[1] - time_values[0] if len(time_values) > 1 else 1.0
+    steps = np.rint((data["time"].to_numpy() - time_values[0]) / time_step).astype(int)
 
-    return lane_changes
+    return np.bincount(steps, minlength=len(time_values))[: len(time_values)]
 
 
-def get_average_lane_changes(lane_changes: dict[str, list]) -> dict[str, float]:
+def get_average_lane_changes(lane_changes: dict[str, np.ndarray]) -> dict[str, float]:
     """
     Calculate the average amount of lane changes per time step.
     """
@@ -140,8 +173,8 @@ def get_average_lane_changes(lane_changes: dict[str, list]) -> dict[str, float]:
 def plot_lane_change_results(
     show: bool,
     ask_save: bool,
-    time: list[float],
-    lane_changes: dict[str, list],
+    time: np.ndarray,
+    lane_changes: dict[str, np.ndarray],
     average_lane_changes: dict[str, float],
 ):
     """
@@ -13,6 +13,8 @@ import numpy as np
 import pandas as pd
 from matplotlib.lines import Line2D
 
+from Analysis.DataReader import load_window, read_data
+from Analysis.Metrics import read_metrics
 from Analysis.OpenSimulation import open_simulation
 
 
@@ -37,6 +39,7 @@ def analyse_road_rush(
     show: bool,
     ask_save: bool,
     simulation: tuple[str, str, dict[str, Any]] | None = None,
+    window: tuple[float, float] | None = None,
 ) -> None:
     """
     Analyse the data from the Road Rush simulation.
@@ -44,6 +47,7 @@ def analyse_road_rush(
     - Amount of cars per lane
     - Average amount of cars per lane
     Also saves the graphs as a png file.
+    With a window (start time, end time) only the data of the window is read and plotted.
     """
     print("Opening simulation...")
 
@@ -58,27 +62,48 @@ def analyse_road_rush(
 
     print("Reading data...")
 
-    # Read the data from the file, ignore the first row which is a header
-    data = pd.read_csv(path, header=0)
+    # The metrics of the simulation already count the cars per lane per time step
+    metrics = read_metrics(project_folder)
 
-    # Check if data is empty if so raise an error
-    if len(data) == 0:
-        raise ValueError(f"Data {data} is empty.")
-
-    print(data)
-
-    ##################################
-
-    print("Analysing data...")
-
-    # Calculate the statistics
-    time_steps = data["time"].unique()
+    if metrics is not None:
+        in_window = (
+            slice(None)
+            if window is None
+            else (metrics["time"] >= window[0]) & (metrics["time"] < window[1])
+        )
+        time_steps = metrics["time"][in_window]
+        amount_of_cars_per_time = pd.DataFrame(metrics["lane_counts"][in_window], index=time_steps)
+    else:
+        if window is None:
+            # Read the data from the CSV file or the binary dataset
+            data = read_data(path, columns=["time", "vehicle_id", "lane_index"])
+        else:
+            # Only read the blocks of the vehicle data in the window
+            data = load_window(
+                project_folder, *window, columns=["time", "vehicle_id", "lane_index"]
+            )
+
+        # Check if data is empty if so raise an error
+        if len(data) == 0:
+            raise ValueError(f"Data {data} is empty.")
+
+        print(data)
+
+        print("Analysing data...")
+
+        # Calculate the statistics
+        time_steps = data["time"].unique()
+
+        amount_of_cars_per_time = (
+            data.pivot_table(
+                index="time", columns="lane_index", values="vehicle_id", aggfunc="count"
+            )
+            .fillna(0)
+            .astype(int)
+        )
 
-    amount_of_cars_per_time = (
-        data.pivot_table(index="time", columns="lane_index", values="vehicle_id", aggfunc="count")
-        .fillna(0)
-        .astype(int)
-    )
+    # The plots start at the start of the window, or at the start of the simulation
+    start_time = 0 if window is None else window[0]
 
     # If there are no cars in a lane, the lane must be added to the dataframe
     for lane in range(simulation_settings["road"]["lanes"]):
@@ -113,7 +138,7 @@ def analyse_road_rush(
         plot_lane = plt.plot(time_steps, amount_of_cars_per_time[lane], label=f"Lane {lane}")
         average_line = plt.hlines(
             amount_of_cars_per_lane_average[lane],
-            xmin=0,
+            xmin=start_time,
             xmax=time_steps.max(),
             color=lighten_color(plot_lane[0].get_color()),
             linestyle="dashed",
@@ -134,7 +159,7 @@ def analyse_road_rush(
     plt.ylabel("Amount of cars in lane")
     plt.grid(True)
     plt.gca().set_ylim(bottom=0)
-    plt.gca().set_xlim(left=0, right=time_steps.max())
+    plt.gca().set_xlim(left=start_time, right=time_steps.max())
     plt.xlabel("Time (s)")
     plt.legend(handles=handles, fancybox=True, framealpha=1, shadow=True, borderpad=1)
     behavior = simulation_settings["vehicle"]["behavior"][0]
@@ -175,15 +200,11 @@ def analyse_road_rush(
 
     # Calculate the average amount of cars per time step in bins of 100 times the time step
     bin_size = 1000 * simulation_settings["simulation"]["time_step"]
-    bins = np.arange(0, data["time"].max() + bin_size, bin_size)
-    amount_of_cars_per_time_average = {}
-    for lane in range(lanes):
-        for bin in bins:  # pylint: disable=redefined-builtin
-            amount_of_cars = amount_of_cars_per_time[lane][
-                (amount_of_cars_per_time.index >= bin)
-                & (amount_of_cars_per_time.index < bin + bin_size)
-            ].mean()
-            amount_of_cars_per_time_average.setdefault(lane, []).append(amount_of_cars)
+    bins = np.arange(start_time, time_steps.max() + bin_size, bin_size)
+    # Average per bin in one pass over the time steps, an empty bin has a nan average
+    bin_numbers = np.floor((amount_of_cars_per_time.index - start_time) / bin_size)
+    bin_averages = amount_of_cars_per_time.groupby(bin_numbers).mean().reindex(range(len(bins)))
+    amount_of_cars_per_time_average = {lane: bin_averages[lane].tolist() for lane in range(lanes)}
 
     line_of_best_fit_averages = {}
     for lane in range(simulation_settings["road"]["lanes"]):
@@ -208,7 +229,7 @@ def analyse_road_rush(
         )
         average_line = plt.hlines(
             amount_of_cars_per_lane_average[lane],
-            xmin=0,
+            xmin=start_time,
             xmax=time_steps.max(),
             color=lighten_color(plot_lane[0].get_color()),
             linestyle="dashed",
@@ -229,7 +250,7 @@ def analyse_road_rush(
     plt.ylabel("Avg. amount of cars in lane")
     plt.grid(True)
     plt.gca().set_ylim(bottom=0)
-    plt.gca().set_xlim(left=0, right=time_steps.max())
+    plt.gca().set_xlim(left=start_time, right=time_steps.max())
     plt.xlabel("Time (s)")
     plt.legend(handles=handles, fancybox=True, framealpha=1, shadow=True, borderpad=1)
     behavior = simulation_settings["vehicle"]["behavior"][0]
@@ -18,11 +18,11 @@ if __name__ == "__main__":
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from matplotlib.ticker import MultipleLocator
 from scipy import stats as st
 from scipy.optimize import curve_fit
 
+from Analysis.DataReader import read_data
 from Analysis.OpenSimulation import open_simulation
 
 
@@ -518,8 +518,8 @@ def analyse_travel_times(
 
     print("Reading data...")
 
-    # Read the data from the file, ignore the first row which is a header
-    data = pd.read_csv(path, header=0)
+    # Read the data from the CSV file or the binary dataset
+    data = read_data(path)
     # Specify the column types
     data = data.astype(
         {
@@ -10,6 +10,7 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import tqdm
 
+from Analysis.DataReader import read_data
 from Analysis.OpenSimulation import open_simulation
 
 
@@ -38,9 +39,9 @@ def analyse_vehicle_data(
 
     print("Reading data...")
 
-    # Read the data from the file, ignore the first row which is a header
+    # Read the data from the CSV file or the binary dataset
     if data is None:
-        data = pd.read_csv(path, header=0)
+        data = read_data(path)
 
     # Check if data is empty if so raise an error
     if len(data) == 0:
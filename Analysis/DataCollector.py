@@ -1,37 +1,176 @@
 """DataCollector for collecting data from the simulation."""
 import json
 import os
+import queue
+import threading
 import time
 import traceback as tb
 from typing import Any
 
+import numpy as np
+import numpy.typing as npt
+
+from Analysis.DataReader import SCHEMA_FILE, TIME_INDEX_FILE
+from Analysis.Detectors import Detectors
+from Analysis.Metrics import RunningMetrics
+from Analysis.RecordingPolicies import RecordingPolicy
+from Analysis.SpawnTimes import SpawnTimes
+from Analysis.StreamingStatistics import StreamingStatistics
 from Vehicles.Vehicle import Vehicle
 
+# Columns of the vehicle data, in the order of vehicle_data.csv
+# A lane index of -1 means the lane is unknown
+vehicle_data_dtype = np.dtype(
+    [
+        ("time", np.float64),
+        ("vehicle_id", np.int64),
+        ("lane_index", np.int64),
+        ("position", np.float64),
+        ("velocity", np.float64),
+    ]
+)
+
+# Columns of the travel times, in the order of travel_times.csv
+travel_time_dtype = np.dtype([("Time", np.float64), ("Traveltime", np.float64)])
+
+# Columns of the lane change events, in the order of lane_changes.csv
+# An overtake is a change to the lane above, else the vehicle returns to the lane below
+lane_change_dtype = np.dtype(
+    [
+        ("time", np.float64),
+        ("vehicle_id", np.int64),
+        ("from_lane", np.int64),
+        ("to_lane", np.int64),
+        ("position", np.float64),
+        ("velocity", np.float64),
+        ("overtake", np.bool_),
+    ]
+)
+
+# csv writes vehicle_data.csv, travel_times.csv and lane_changes.csv,
+# binary writes the same data as .npz chunks described by data_schema.json (see DataReader).
+# Both write vehicle_data_index.json, the time range of every block of the vehicle data
+output_formats = ("csv", "binary")
+
 
 class DataCollector:
     """Collect data from the simulation."""
 
-    def __init__(self, simulation_id: str):
-        self.vehicle_data: list[tuple[float, int, int | None, float, float]] = []
+    def __init__(
+        self,
+        simulation_id: str,
+        output_format: str = "csv",
+        asynchronous_export: bool = False,
+        max_pending_exports: int = 2,
+        recording_policies: list[RecordingPolicy] | None = None,
+        record_vehicle_data: bool = True,
+        detectors: Detectors | None = None,
+        path: str | None = None,
+    ):
+        if output_format not in output_formats:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.output_format: str = output_format
+        # A queue without a maximum size would let the pending buffers grow without bound
+        if max_pending_exports < 1:
+            raise ValueError(f"Can't wait for {max_pending_exports} pending exports")
+
         self.travel_times: list[tuple[float, float]] = []
+        # Lane change events, with the columns of lane_change_dtype
+        self.lane_changes: list[tuple[float, int, int, int, float, float, bool]] = []
+        # The data is exported when there are this many lane change events or travel times,
+        # so without the vehicle data the events don't pile up until the end of the simulation
+        self.maximum_events: int = 10**5
 
-        self.car_data: dict[int, dict[str, Any]] = {}
+        # Spawn time of the vehicles on the road, for their travel times
+        self.spawn_times: SpawnTimes = SpawnTimes()
 
         self.simulation_id: str = simulation_id
-        self.path: str = self.create_folder(self.simulation_id)
-
-        self.iteration: int = 0
-        self.maximum_data: int = 3 * 10**6
+        # The data is stored in the given folder, or in a new folder in tmp
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.path: str = path if path is not None else self.create_folder(self.simulation_id)
+
+        # Without the vehicle data only the metrics and the travel times are recorded
+        self.record_vehicle_data: bool = record_vehicle_data
+        self.metrics: RunningMetrics = RunningMetrics()
+        self.travel_time_statistics: StreamingStatistics = StreamingStatistics()
+        self.detectors: Detectors | None = detectors
+
+        self.maximum_data: int = 3 * 10**6 if record_vehicle_data else 0
+        # Preallocated buffer for the vehicle data, filled up to the cursor
+        self.vehicle_data: npt.NDArray[Any] = np.empty(self.maximum_data, dtype=vehicle_data_dtype)
+        self.cursor: int = 0
+        # Number of rows in a block of the vehicle data, the blocks are written one at a time
+        # and the time index has the time range of every block
+        self.write_chunk_size: int = 10**5
+
+        # Time index of the vehicle data, with the start and end time, the number of rows
+        # and the byte offset in vehicle_data.csv or the binary chunk of every block
+        self.time_index: dict[str, Any] = {
+            "format": output_format,
+            "columns": list(vehicle_data_dtype.names),
+            "blocks": [],
+        }
+
+        # Schema of the binary datasets, with the chunks that are written so far
+        self.schema: dict[str, Any] = {
+            "datasets": {
+                name: {
+                    "columns": {column: dtype[column].str for column in dtype.names},
+                    "rows": 0,
+                    "chunks": [],
+                }
+                for name, dtype in (
+                    ("vehicle_data", vehicle_data_dtype),
+                    ("travel_times", travel_time_dtype),
+                    ("lane_changes", lane_change_dtype),
+                )
+                if name != "vehicle_data" or record_vehicle_data
+            }
+        }
 
         self.current_simulation_time: float = 0
 
+        # Only the data that every recording policy records is collected
+        self.recording_policies: list[RecordingPolicy] = recording_policies or []
+        # Number of the current step, counted by set_new_simulation_time
+        self.step: int = -1
+        self.recording_step: bool = True
+
+        # With an asynchronous export a full buffer is written by a writer thread, while the
+        # simulation continues in an empty buffer. Only when more than max_pending_exports
+        # buffers are waiting to be written, the simulation waits for the writer.
+        self.asynchronous_export: bool = asynchronous_export
+        self.export_queue: queue.Queue[
+            tuple[npt.NDArray[Any], int, list[tuple[float, float]], list[tuple[Any, ...]]] | None
+        ] = queue.Queue(maxsize=max_pending_exports)
+        # Buffers that are written and can be filled again
+        self.free_buffers: queue.Queue[npt.NDArray[Any]] = queue.Queue()
+        self.writer: threading.Thread | None = None
+        self.writer_error: BaseException | None = None
+
     def __enter__(self):
         self.write_header()
 
+        if self.asynchronous_export:
+            self.writer = threading.Thread(target=self.run_writer, daemon=True)
+            self.writer.start()
+
         return self
 
     def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any):
-        self.export_data()
+        if self.writer_error is None:
+            self.export_data()
+        self.stop_writer()
+
+        if self.writer_error is not None:
+            raise RuntimeError("Exporting the data failed") from self.writer_error
+
+        self.metrics.write(self.path)
+        self.travel_time_statistics.write(self.path)
+        if self.detectors is not None:
+            self.detectors.write(self.path)
+
         if exc_type is not None:
             print(exc_type, exc_value)
             tb.print_tb(traceback)
@@ -39,106 +178,364 @@ class DataCollector:
 
     def create_folder(self, simulation_id: str):
         """Create a folder to store the data in"""
-        # Check if there is a tmp folder in the current directory
-        if not os.path.exists(os.path.join(os.getcwd(), "tmp")):
-            # If not create a tmp folder
-            os.mkdir(os.path.join(os.getcwd(), "tmp"))
+        # Create the tmp folder in the current directory if it doesn't exist
+        os.makedirs(os.path.join(os.getcwd(), "tmp"), exist_ok=True)
 
+        # Add a number to the folder name if the folder exists. The folder is claimed by
+        # creating it, so simulations running in parallel never share a folder.
         path = os.path.join(os.getcwd(), "tmp", simulation_id)
-
-        # Check if there is a folder with the simulation_id in the tmp folder
-        if not os.path.exists(path):
-            # If not create a folder with the simulation_id
-            os.mkdir(path=path)
-            return path
-
-        # If folder exists, check if there are files in the folder
-        files = os.listdir(path)
-        if len(files) == 0:
-            return path
-
-        # Add a number to the folder name
         folder_number = 2
-        path = os.path.join(os.getcwd(), "tmp", f"{simulation_id}_{folder_number}")
-        while os.path.exists(path):
-            folder_number += 1
-            path = os.path.join(os.getcwd(), "tmp", f"{simulation_id}_{folder_number}")
-        os.mkdir(path=path)
-        return path
+        while True:
+            try:
+                os.mkdir(path=path)
+                return path
+            except FileExistsError:
+                path = os.path.join(os.getcwd(), "tmp", f"{simulation_id}_{folder_number}")
+                folder_number += 1
 
     def collect_data(self, vehicle: Vehicle, lane_index: int | None = None):
         """Collect data from the vehicle,
-        if the maximum number of data points is reached, export the data to a file"""
+        if the buffer is full, export the data to a file"""
+
+        if lane_index is None:
+            lane_index = -1
+        else:
+            self.metrics.add_vehicle(lane_index, vehicle.velocity)
+            if self.detectors is not None:
+                self.detectors.add_vehicle(
+                    lane_index, vehicle.previous_position, vehicle.position, vehicle.velocity
+                )
+
+        if not self.recording_step:
+            return
+
+        for policy in self.recording_policies:
+            if not policy.records_vehicle(
+                vehicle.id, lane_index, vehicle.position, vehicle.velocity
+            ):
+                return
 
         # ToDo: Kijken naar verdwijnende auto's, misschien als de data wordt weggeschreven? # pylint: disable=fixme
-        self.iteration += 1
-
-        self.vehicle_data.append(
-            (
-                self.current_simulation_time,
-                vehicle.id,
-                lane_index,
-                vehicle.position,
-                vehicle.velocity,
-            )
+        self.vehicle_data[self.cursor] = (
+            self.current_simulation_time,
+            vehicle.id,
+            lane_index,
+            vehicle.position,
+            vehicle.velocity,
         )
-
-        if self.iteration >= self.maximum_data:
-            print(f"Maximum reached: {self.iteration} / {self.maximum_data}")
-            start = time.perf_counter_ns()
-            self.export_data()
-            self.iteration = 0
-            print(f"{(time.perf_counter_ns() - start) / 1e9} s")
+        self.cursor += 1
+
+        if self.cursor >= len(self.vehicle_data):
+            self.flush()
+
+    def collect_lane(
+        self,
+        lane_index: int,
+        vehicle_ids: npt.NDArray[np.int64],
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+        previous_positions: npt.NDArray[np.float64] | None = None,
+    ):
+        """Collect data from all vehicles in a lane at once,
+        if the buffer is full, export the data to a file.
+        The previous positions are needed for the loop detectors."""
+
+        self.metrics.add_lane(lane_index, velocities)
+        if self.detectors is not None:
+            if previous_positions is None:
+                raise ValueError("The detectors need the previous positions of the vehicles")
+            self.detectors.add_lane(lane_index, previous_positions, positions, velocities)
+
+        if not self.recording_step:
+            return
+
+        for policy in self.recording_policies:
+            recorded = policy.records_vehicles(vehicle_ids, lane_index, positions, velocities)
+            if not recorded.all():
+                vehicle_ids = vehicle_ids[recorded]
+                positions = positions[recorded]
+                velocities = velocities[recorded]
+
+        start = 0
+        while start < len(vehicle_ids):
+            # Fill the buffer as far as possible and flush it when it is full
+            count = min(len(vehicle_ids) - start, len(self.vehicle_data) - self.cursor)
+            rows = self.vehicle_data[self.cursor : self.cursor + count]
+            rows["time"] = self.current_simulation_time
+            rows["vehicle_id"] = vehicle_ids[start : start + count]
+            rows["lane_index"] = lane_index
+            rows["position"] = positions[start : start + count]
+            rows["velocity"] = velocities[start : start + count]
+
+            self.cursor += count
+            start += count
+
+            if self.cursor >= len(self.vehicle_data):
+                self.flush()
+
+    def flush(self):
+        """Export the data because the buffer is full"""
+
+        print(f"Maximum reached: {self.cursor} / {self.maximum_data}")
+        start = time.perf_counter_ns()
+        self.export_data()
+        print(f"{(time.perf_counter_ns() - start) / 1e9} s")
 
     def set_new_simulation_time(self, simulation_time: float) -> None:
-        """Set a new simulation time"""
+        """Set a new simulation time, called once at the start of every step"""
 
         self.current_simulation_time = simulation_time
+        self.metrics.start_step(simulation_time)
+        if self.detectors is not None:
+            self.detectors.start_step(simulation_time)
+        self.step += 1
+        self.recording_step = self.record_vehicle_data and all(
+            policy.records_step(self.step) for policy in self.recording_policies
+        )
+
+    def recording_settings(self) -> dict[str, Any]:
+        """Return the settings of the recording policies, an empty dict if everything is recorded"""
+
+        settings: dict[str, Any] = {}
+        for policy in self.recording_policies:
+            settings.update(policy.settings())
+        return settings
 
     def vehicle_added(self, vehicle: Vehicle, simulation_time: float):
         """Record the time when a vehicle is added to the road"""
 
-        self.car_data[vehicle.id] = {"start_time": simulation_time}
+        self.spawn_times.add(vehicle.id, simulation_time)
 
     def vehicle_deleted(self, vehicle: Vehicle, simulation_time: float):
-        """Calculate and record the travel time of a vehicle"""
+        """Calculate and record the travel time of a vehicle,
+        if there are too many travel times, export the data to a file"""
+
+        travel_time = simulation_time - self.spawn_times.pop(vehicle.id)
+        self.travel_times.append((simulation_time, travel_time))
+        self.travel_time_statistics.update(travel_time)
+        for policy in self.recording_policies:
+            policy.vehicle_deleted(vehicle.id)
+
+        if len(self.travel_times) >= self.maximum_events:
+            self.export_data()
 
-        self.car_data[vehicle.id]["stop_time"] = simulation_time
-        self.car_data[vehicle.id]["travel_time"] = (
-            simulation_time - self.car_data[vehicle.id]["start_time"]
+    def vehicle_changed_lane(self, vehicle: Vehicle, current_lane_index: int, new_lane_index: int):
+        """Record that a vehicle changed from the current lane to the new lane,
+        if there are too many lane change events, export the data to a file"""
+
+        self.metrics.add_lane_changes(current_lane_index, new_lane_index)
+        self.lane_changes.append(
+            (
+                self.current_simulation_time,
+                vehicle.id,
+                current_lane_index,
+                new_lane_index,
+                vehicle.position,
+                vehicle.velocity,
+                new_lane_index > current_lane_index,
+            )
+        )
+
+        if len(self.lane_changes) >= self.maximum_events:
+            self.export_data()
+
+    def vehicles_changed_lane(
+        self,
+        current_lane_index: int,
+        new_lane_index: int,
+        vehicle_ids: npt.NDArray[np.int64],
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ):
+        """Record that the vehicles changed from the current lane to the new lane,
+        if there are too many lane change events, export the data to a file"""
+
+        self.metrics.add_lane_changes(current_lane_index, new_lane_index, len(vehicle_ids))
+        self.lane_changes.extend(
+            (
+                self.current_simulation_time,
+                vehicle_id,
+                current_lane_index,
+                new_lane_index,
+                position,
+                velocity,
+                new_lane_index > current_lane_index,
+            )
+            for vehicle_id, position, velocity in zip(
+                vehicle_ids.tolist(), positions.tolist(), velocities.tolist()
+            )
         )
-        self.travel_times.append((simulation_time, self.car_data[vehicle.id]["travel_time"]))
 
-    def write_data(self):
+        if len(self.lane_changes) >= self.maximum_events:
+            self.export_data()
+
+    def run_writer(self) -> None:
+        """Write the buffers in the export queue until the queue is stopped,
+        runs in the writer thread"""
+
+        while (export := self.export_queue.get()) is not None:
+            vehicle_data, cursor, travel_times, lane_changes = export
+            try:
+                # After an error the remaining data is dropped, the error is raised on exit
+                if self.writer_error is None:
+                    self.write_data(vehicle_data[:cursor], travel_times, lane_changes)
+            except BaseException as error:  # pylint: disable=broad-except
+                self.writer_error = error
+            self.free_buffers.put(vehicle_data)
+
+    def stop_writer(self) -> None:
+        """Wait until the writer thread has written all buffers in the export queue"""
+
+        if self.writer is None:
+            return
+
+        self.export_queue.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def write_data(
+        self,
+        vehicle_data: npt.NDArray[Any],
+        travel_times: list[tuple[float, float]],
+        lane_changes: list[tuple[Any, ...]],
+    ):
         """Write the collected data to a file"""
 
-        vehicle_file = os.path.join(self.path, "vehicle_data.csv")
-        with open(vehicle_file, "a", encoding="utf-8") as f:
-            for vehicle_data in self.vehicle_data:
-                f.write(",".join([str(data) for data in vehicle_data]) + "\n")
+        if self.output_format == "binary":
+            self.write_binary_data(vehicle_data, travel_times, lane_changes)
+            return
+
+        if self.record_vehicle_data:
+            vehicle_file = os.path.join(self.path, "vehicle_data.csv")
+            # Binary mode, so the offsets in the time index are byte offsets on every platform
+            with open(vehicle_file, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                # Format the rows in blocks, so only a block of text is in memory at once
+                for start in range(0, len(vehicle_data), self.write_chunk_size):
+                    block = vehicle_data[start : start + self.write_chunk_size]
+                    columns = [block[name].tolist() for name in vehicle_data_dtype.names]
+                    text = "".join(map("{},{},{},{},{}\n".format, *columns)).encode("utf-8")
+                    f.write(text)
+                    self.add_index_block(block, offset=offset)
+                    offset += len(text)
+            self.write_time_index()
 
         travel_time_file = os.path.join(self.path, "travel_times.csv")
         with open(travel_time_file, "a", encoding="utf-8") as f:
-            for travel_time in self.travel_times:
+            for travel_time in travel_times:
                 f.write(",".join([str(data) for data in travel_time]) + "\n")
 
+        lane_change_file = os.path.join(self.path, "lane_changes.csv")
+        with open(lane_change_file, "a", encoding="utf-8") as f:
+            for lane_change in lane_changes:
+                f.write("{},{},{},{},{},{},{}\n".format(*lane_change))
+
+    def write_binary_data(
+        self,
+        vehicle_data: npt.NDArray[Any],
+        travel_times: list[tuple[float, float]],
+        lane_changes: list[tuple[Any, ...]],
+    ) -> None:
+        """Write the collected data as new chunks of the binary datasets"""
+
+        if self.record_vehicle_data:
+            # A chunk per block of the time index, so a time window only loads its own blocks
+            for start in range(0, len(vehicle_data), self.write_chunk_size):
+                block = vehicle_data[start : start + self.write_chunk_size]
+                self.write_chunk("vehicle_data", block)
+                self.add_index_block(
+                    block, chunk=self.schema["datasets"]["vehicle_data"]["chunks"][-1]
+                )
+            self.write_time_index()
+        self.write_chunk("travel_times", np.array(travel_times, dtype=travel_time_dtype))
+        self.write_chunk("lane_changes", np.array(lane_changes, dtype=lane_change_dtype))
+        self.write_schema()
+
+    def write_chunk(self, name: str, data: npt.NDArray[Any]) -> None:
+        """Write the data as a new chunk of the binary dataset with the given name"""
+
+        if len(data) == 0:
+            return
+
+        dataset = self.schema["datasets"][name]
+        chunk = f"{name}_{len(dataset['chunks']):05d}.npz"
+        np.savez(
+            os.path.join(self.path, chunk), **{column: data[column] for column in data.dtype.names}
+        )
+        dataset["chunks"].append(chunk)
+        dataset["rows"] += len(data)
+
+    def add_index_block(self, block: npt.NDArray[Any], **location: Any) -> None:
+        """Add a block of the vehicle data to the time index, at the given offset or chunk"""
+
+        self.time_index["blocks"].append(
+            {
+                "start_time": float(block["time"][0]),
+                "end_time": float(block["time"][-1]),
+                "rows": len(block),
+                **location,
+            }
+        )
+
+    def write_time_index(self) -> None:
+        """Write the time index of the vehicle data"""
+
+        index_file = os.path.join(self.path, TIME_INDEX_FILE)
+        with open(index_file, "w", encoding="utf-8") as f:
+            json.dump(self.time_index, f)
+
+    def write_schema(self) -> None:
+        """Write the schema of the binary datasets"""
+
+        schema_file = os.path.join(self.path, SCHEMA_FILE)
+        with open(schema_file, "w", encoding="utf-8") as f:
+            json.dump(self.schema, f, indent=4)
+
     def write_header(self) -> None:
         """Write the header of the data files"""
 
-        vehicle_file = os.path.join(self.path, "vehicle_data.csv")
-        with open(vehicle_file, "w", encoding="utf-8") as f:
-            f.write("time,vehicle_id,lane_index,position,velocity\n")
+        if self.record_vehicle_data:
+            self.write_time_index()
+
+        if self.output_format == "binary":
+            self.write_schema()
+            return
+
+        if self.record_vehicle_data:
+            vehicle_file = os.path.join(self.path, "vehicle_data.csv")
+            with open(vehicle_file, "w", encoding="utf-8") as f:
+                f.write("time,vehicle_id,lane_index,position,velocity\n")
 
         travel_time_file = os.path.join(self.path, "travel_times.csv")
         with open(travel_time_file, "w", encoding="utf-8") as f:
             f.write("Time,Traveltime\n")
 
+        lane_change_file = os.path.join(self.path, "lane_changes.csv")
+        with open(lane_change_file, "w", encoding="utf-8") as f:
+            f.write(",".join(lane_change_dtype.names) + "\n")
+
     def export_data(self):
         """Export the collected data to a file (e.g., CSV)"""
 
-        self.write_data()
-        self.vehicle_data = []
+        if self.writer is None:
+            self.write_data(self.vehicle_data[: self.cursor], self.travel_times, self.lane_changes)
+        else:
+            if self.writer_error is not None:
+                raise RuntimeError("Exporting the data failed") from self.writer_error
+
+            # Hand the buffer to the writer thread and continue in a free or new buffer,
+            # this waits if the export queue is full
+            self.export_queue.put(
+                (self.vehicle_data, self.cursor, self.travel_times, self.lane_changes)
+            )
+            try:
+                self.vehicle_data = self.free_buffers.get_nowait()
+            except queue.Empty:
+                self.vehicle_data = np.empty(self.maximum_data, dtype=vehicle_data_dtype)
+
+        self.cursor = 0
         self.travel_times = []
+        self.lane_changes = []
 
     def add_extra_data(self, data: dict[str, Any]):
         """Add extra data to the simulation_settings.json file"""
@@ -0,0 +1,155 @@
+"""Read the data files of a simulation, stored as CSV files or as binary datasets.
+A binary dataset is a set of .npz chunks with an array per column,
+described by the data_schema.json file in the simulation folder.
+The path of a dataset is the path of the CSV file it replaces, e.g. vehicle_data.csv.
+The vehicle data is written in time-ordered blocks, with the time range of every block
+in the vehicle_data_index.json file, so load_window only reads the blocks of a time window."""
+import json
+import os
+from bisect import bisect_left
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_FILE = "data_schema.json"
+TIME_INDEX_FILE = "vehicle_data_index.json"
+
+
+def read_schema(folder: str) -> dict[str, Any] | None:
+    """Return the schema of the binary datasets in the folder, or None if there are none"""
+
+    schema_file = os.path.join(folder, SCHEMA_FILE)
+    if not os.path.exists(schema_file):
+        return None
+    with open(schema_file, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def get_dataset(path: str) -> tuple[str, dict[str, Any]] | None:
+    """Return the folder and the schema entry of the binary dataset for the path,
+    or None if there is no such dataset"""
+
+    folder, filename = os.path.split(path)
+    schema = read_schema(folder)
+    if schema is None:
+        return None
+
+    dataset = schema["datasets"].get(os.path.splitext(filename)[0])
+    if dataset is None:
+        return None
+    return folder, dataset
+
+
+def data_exists(path: str) -> bool:
+    """Return whether there is a CSV file or a binary dataset for the path"""
+
+    return os.path.exists(path) or get_dataset(path) is not None
+
+
+def read_data(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read a data file of a simulation into a DataFrame,
+    from the CSV file if it exists, else from the binary dataset.
+    Only the given columns are read, all columns if None."""
+
+    if os.path.exists(path):
+        return pd.read_csv(path, header=0, usecols=columns)
+
+    found = get_dataset(path)
+    if found is None:
+        raise FileNotFoundError(f"File {path} does not exist.")
+    folder, dataset = found
+
+    if columns is None:
+        columns = list(dataset["columns"])
+
+    # Read every column of every chunk, np.load only reads the requested arrays of a chunk
+    chunks: dict[str, list[np.ndarray]] = {column: [] for column in columns}
+    for chunk in dataset["chunks"]:
+        with np.load(os.path.join(folder, chunk)) as arrays:
+            for column in columns:
+                chunks[column].append(arrays[column])
+
+    return pd.DataFrame(
+        {
+            column: np.concatenate(arrays)
+            if arrays
+            else np.empty(0, dtype=dataset["columns"][column])
+            for column, arrays in chunks.items()
+        }
+    )
+
+
+def read_time_index(folder: str) -> dict[str, Any] | None:
+    """Return the time index of the vehicle data in the folder, or None if there is none"""
+
+    index_file = os.path.join(folder, TIME_INDEX_FILE)
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def load_window(
+    folder: str, start_time: float, end_time: float, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """Read the vehicle data from start_time up to (not including) end_time into a DataFrame.
+    Only the blocks of the time index that overlap the window are read,
+    without a time index (older simulations) all vehicle data is read.
+    Only the given columns are read, all columns if None."""
+
+    # The time column is needed to select the rows of the window
+    read_columns = None if columns is None else list(dict.fromkeys(["time", *columns]))
+
+    index = read_time_index(folder)
+    if index is None:
+        data = read_data(os.path.join(folder, "vehicle_data.csv"), columns=read_columns)
+    else:
+        blocks = index["blocks"]
+        # The blocks are ordered by time, the first block that ends in the window
+        # up to the last block that starts in the window overlap the window
+        first = bisect_left([block["end_time"] for block in blocks], start_time)
+        last = bisect_left([block["start_time"] for block in blocks], end_time)
+        data = read_blocks(folder, index, blocks[first:last], read_columns)
+
+    window = data[(data["time"] >= start_time) & (data["time"] < end_time)]
+    if columns is not None:
+        window = window[columns]
+    return window.reset_index(drop=True)
+
+
+def read_blocks(
+    folder: str, index: dict[str, Any], blocks: list[dict[str, Any]], columns: list[str] | None
+) -> pd.DataFrame:
+    """Read consecutive blocks of the time index of the vehicle data into a DataFrame"""
+
+    if columns is None:
+        columns = index["columns"]
+
+    if index["format"] == "csv":
+        # Consecutive blocks are consecutive rows of the CSV file
+        with open(os.path.join(folder, "vehicle_data.csv"), "rb") as file:
+            if blocks:
+                file.seek(blocks[0]["offset"])
+            return pd.read_csv(
+                file,
+                header=None,
+                names=index["columns"],
+                usecols=columns,
+                nrows=sum(block["rows"] for block in blocks),
+            )
+
+    schema = read_schema(folder)
+    dtypes = schema["datasets"]["vehicle_data"]["columns"] if schema is not None else {}
+    arrays: dict[str, list[np.ndarray]] = {column: [] for column in columns}
+    for block in blocks:
+        with np.load(os.path.join(folder, block["chunk"])) as chunk:
+            for column in columns:
+                arrays[column].append(chunk[column])
+
+    return pd.DataFrame(
+        {
+            column: np.concatenate(values) if values else np.empty(0, dtype=dtypes.get(column))
+            for column, values in arrays.items()
+        }
+    )
@@ -0,0 +1,275 @@
+"""Virtual detectors that measure the traffic at fixed places on the road while the simulation runs:
+- loop detectors count the vehicles crossing a position and measure their speeds
+- section detectors measure the vehicles inside an interval of the road
+The measurements are aggregated per lane over intervals of a fixed duration
+and written to detectors.npz, as flow, density and speed ready for a fundamental diagram.
+The detectors are set with the "detectors" entry of the simulation settings, e.g.
+{"loops": [500, 1500], "sections": [[900, 1100]], "interval": 60}"""
+from __future__ import annotations
+
+import os
+from bisect import bisect_right
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+DETECTORS_FILE = "detectors.npz"
+
+
+class LoopDetectors:
+    """Loop detectors at the given positions, a vehicle crosses a loop at position x
+    when its previous position is before x and its position is at or after x."""
+
+    def __init__(self, positions: list[float], lanes: int) -> None:
+        self.positions: list[float] = sorted(float(position) for position in positions)
+        self.lanes: int = lanes
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new interval"""
+
+        # Number of crossing vehicles, and the sum of their speeds and inverse speeds per lane
+        self.counts: list[list[int]] = [[0] * self.lanes for _ in self.positions]
+        self.speed_sums: list[list[float]] = [[0.0] * self.lanes for _ in self.positions]
+        self.inverse_speed_sums: list[list[float]] = [[0.0] * self.lanes for _ in self.positions]
+
+    def add_vehicle(
+        self, lane_index: int, previous_position: float, position: float, velocity: float
+    ) -> None:
+        """Count a vehicle at every loop it crossed in the last step"""
+
+        for loop in range(
+            bisect_right(self.positions, previous_position), bisect_right(self.positions, position)
+        ):
+            self.counts[loop][lane_index] += 1
+            self.speed_sums[loop][lane_index] += velocity
+            if velocity > 0:
+                self.inverse_speed_sums[loop][lane_index] += 1 / velocity
+
+    def add_lane(
+        self,
+        lane_index: int,
+        previous_positions: npt.NDArray[np.float64],
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> None:
+        """Count the vehicles of a lane at every loop they crossed in the last step,
+        the positions are sorted in descending order"""
+
+        for loop, loop_position in enumerate(self.positions):
+            # Only the vehicles at or after the loop can have crossed it
+            after = np.searchsorted(-positions, -loop_position, side="right")
+            crossed = previous_positions[:after] < loop_position
+            if not crossed.any():
+                continue
+
+            speeds = velocities[:after][crossed]
+            self.counts[loop][lane_index] += len(speeds)
+            self.speed_sums[loop][lane_index] += float(speeds.sum())
+            self.inverse_speed_sums[loop][lane_index] += float((1 / speeds[speeds > 0]).sum())
+
+
+class SectionDetectors:
+    """Section detectors over the given intervals of the road, [start, end)"""
+
+    def __init__(self, sections: list[tuple[float, float]], lanes: int) -> None:
+        self.sections: list[tuple[float, float]] = [
+            (float(start), float(end)) for start, end in sections
+        ]
+        self.lanes: int = lanes
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new interval"""
+
+        # Number of vehicles in the section summed over the steps, and the sum of their speeds
+        self.vehicle_steps: list[list[int]] = [[0] * self.lanes for _ in self.sections]
+        self.speed_sums: list[list[float]] = [[0.0] * self.lanes for _ in self.sections]
+
+    def add_vehicle(self, lane_index: int, position: float, velocity: float) -> None:
+        """Count a vehicle in every section it is in"""
+
+        for section, (start, end) in enumerate(self.sections):
+            if start <= position < end:
+                self.vehicle_steps[section][lane_index] += 1
+                self.speed_sums[section][lane_index] += velocity
+
+    def add_lane(
+        self,
+        lane_index: int,
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> None:
+        """Count the vehicles of a lane in every section,
+        the positions are sorted in descending order"""
+
+        for section, (start, end) in enumerate(self.sections):
+            # The vehicles before the end and at or after the start are a slice of the lane
+            first = np.searchsorted(-positions, -end, side="right")
+            last = np.searchsorted(-positions, -start, side="right")
+            self.vehicle_steps[section][lane_index] += int(last - first)
+            self.speed_sums[section][lane_index] += float(velocities[first:last].sum())
+
+
+class Detectors:
+    """The loop and section detectors of a simulation, aggregated over intervals of
+    a fixed number of steps"""
+
+    def __init__(
+        self,
+        loop_positions: list[float],
+        sections: list[tuple[float, float]],
+        lanes: int,
+        interval: float,
+        time_step: float,
+    ) -> None:
+        self.loops: LoopDetectors = LoopDetectors(loop_positions, lanes)
+        self.sections: SectionDetectors = SectionDetectors(sections, lanes)
+        self.time_step: float = time_step
+        self.interval_steps: int = max(round(interval / time_step), 1)
+
+        # Start and number of steps of the current interval
+        self.interval_start: float | None = None
+        self.steps: int = 0
+
+        # Aggregates of the finished intervals
+        self.interval_starts: list[float] = []
+        self.interval_durations: list[float] = []
+        self.loop_counts: list[list[list[int]]] = []
+        self.loop_speed_sums: list[list[list[float]]] = []
+        self.loop_inverse_speed_sums: list[list[list[float]]] = []
+        self.section_vehicle_steps: list[list[list[int]]] = []
+        self.section_speed_sums: list[list[list[float]]] = []
+
+    def start_step(self, simulation_time: float) -> None:
+        """Start a new step at the given time, after the last step of an interval
+        the interval is finished"""
+
+        if self.steps >= self.interval_steps:
+            self.finish_interval()
+        if self.interval_start is None:
+            self.interval_start = simulation_time
+        self.steps += 1
+
+    def finish_interval(self) -> None:
+        """Store the aggregates of the current interval and start a new interval"""
+
+        if self.interval_start is None:
+            return
+
+        self.interval_starts.append(self.interval_start)
+        self.interval_durations.append(self.steps * self.time_step)
+        self.loop_counts.append(self.loops.counts)
+        self.loop_speed_sums.append(self.loops.speed_sums)
+        self.loop_inverse_speed_sums.append(self.loops.inverse_speed_sums)
+        self.section_vehicle_steps.append(self.sections.vehicle_steps)
+        self.section_speed_sums.append(self.sections.speed_sums)
+
+        self.loops.reset()
+        self.sections.reset()
+        self.interval_start = None
+        self.steps = 0
+
+    def add_vehicle(
+        self, lane_index: int, previous_position: float, position: float, velocity: float
+    ) -> None:
+        """Measure a vehicle in the current step"""
+
+        self.loops.add_vehicle(lane_index, previous_position, position, velocity)
+        self.sections.add_vehicle(lane_index, position, velocity)
+
+    def add_lane(
+        self,
+        lane_index: int,
+        previous_positions: npt.NDArray[np.float64],
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> None:
+        """Measure all vehicles of a lane in the current step"""
+
+        self.loops.add_lane(lane_index, previous_positions, positions, velocities)
+        self.sections.add_lane(lane_index, positions, velocities)
+
+    def to_arrays(self) -> dict[str, npt.NDArray[Any]]:
+        """Return the measurements of all finished intervals as arrays, with a row per interval,
+        then a column per detector and a column per lane. The flow is in vehicles per hour,
+        the density in vehicles per km and the speeds in m/s. A speed is nan without vehicles."""
+
+        lanes = self.loops.lanes
+        durations = np.array(self.interval_durations, dtype=np.float64)
+        loop_shape = (len(durations), len(self.loops.positions), lanes)
+        section_shape = (len(durations), len(self.sections.sections), lanes)
+
+        loop_counts = np.array(self.loop_counts, dtype=np.int64).reshape(loop_shape)
+        loop_speed_sums = np.array(self.loop_speed_sums, dtype=np.float64).reshape(loop_shape)
+        loop_inverse_speed_sums = np.array(self.loop_inverse_speed_sums).reshape(loop_shape)
+        section_vehicle_steps = np.array(self.section_vehicle_steps, dtype=np.int64).reshape(
+            section_shape
+        )
+        section_speed_sums = np.array(self.section_speed_sums, dtype=np.float64).reshape(
+            section_shape
+        )
+        section_bounds = np.array(self.sections.sections, dtype=np.float64).reshape(-1, 2)
+        section_lengths = section_bounds[:, 1] - section_bounds[:, 0]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            loop_flow = loop_counts / durations[:, None, None] * 3600
+            # The harmonic mean of the speeds at a loop estimates the space mean speed
+            loop_harmonic_speed = loop_counts / loop_inverse_speed_sums
+            # Edie's definitions: the time spent and distance travelled in the section,
+            # per length of the section and duration of the interval
+            time_spent = section_vehicle_steps * self.time_step
+            distance = section_speed_sums * self.time_step
+            area = section_lengths[None, :, None] * durations[:, None, None]
+
+            return {
+                "interval_start": np.array(self.interval_starts, dtype=np.float64),
+                "interval_duration": durations,
+                "loop_positions": np.array(self.loops.positions, dtype=np.float64),
+                "loop_counts": loop_counts,
+                "loop_flow": loop_flow,
+                "loop_mean_speed": loop_speed_sums / loop_counts,
+                "loop_harmonic_speed": loop_harmonic_speed,
+                "loop_density": loop_flow / (loop_harmonic_speed * 3.6),
+                "section_bounds": section_bounds,
+                "section_flow": distance / area * 3600,
+                "section_density": time_spent / area * 1000,
+                "section_speed": distance / time_spent,
+            }
+
+    def write(self, folder: str) -> None:
+        """Finish the current interval and write the measurements to the detectors file"""
+
+        self.finish_interval()
+        np.savez(os.path.join(folder, DETECTORS_FILE), **self.to_arrays())
+
+
+def detectors_factory(detectors: dict[str, Any], lanes: int, time_step: float) -> Detectors | None:
+    """Factory function for creating the detectors of the detector settings,
+    None if there are no detectors"""
+
+    unknown = set(detectors) - {"loops", "sections", "interval"}
+    if unknown:
+        raise ValueError(f"Unknown detector settings: {', '.join(sorted(unknown))}")
+
+    if not detectors.get("loops") and not detectors.get("sections"):
+        return None
+
+    return Detectors(
+        loop_positions=detectors.get("loops", []),
+        sections=detectors.get("sections", []),
+        lanes=lanes,
+        interval=detectors.get("interval", 60),
+        time_step=time_step,
+    )
+
+
+def read_detectors(folder: str) -> dict[str, npt.NDArray[Any]] | None:
+    """Return the detector measurements of the simulation in the folder, or None if there are none"""
+
+    detectors_file = os.path.join(folder, DETECTORS_FILE)
+    if not os.path.exists(detectors_file):
+        return None
+    with np.load(detectors_file) as arrays:
+        return dict(arrays)
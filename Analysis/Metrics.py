@@ -0,0 +1,152 @@
+"""Aggregate metrics of a simulation, maintained by the DataCollector while the simulation runs
+and written to metrics.npz, so the analyses don't have to read the vehicle data."""
+from __future__ import annotations
+
+import os
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+METRICS_FILE = "metrics.npz"
+
+
+class RunningMetrics:
+    """Running aggregates of a simulation:
+    - the number of vehicles and the sum of their velocities per lane per step
+    - the number of vehicles leaving and entering each lane by a lane change per step
+    The lanes are added when a vehicle is first seen in them."""
+
+    def __init__(self) -> None:
+        # Aggregates of the current step, kept in lists because they are updated per vehicle
+        self.step_counts: list[int] = []
+        self.step_velocity_sums: list[float] = []
+        self.step_changes_out: list[int] = []
+        self.step_changes_in: list[int] = []
+
+        # Aggregates of the finished steps, filled up to self.steps
+        self.steps: int = 0
+        self.times: npt.NDArray[np.float64] = np.empty(1024)
+        self.lane_counts: npt.NDArray[np.int64] = np.zeros((1024, 0), dtype=np.int64)
+        self.lane_velocity_sums: npt.NDArray[np.float64] = np.zeros((1024, 0))
+        self.lane_changes_out: npt.NDArray[np.int64] = np.zeros((1024, 0), dtype=np.int64)
+        self.lane_changes_in: npt.NDArray[np.int64] = np.zeros((1024, 0), dtype=np.int64)
+
+        self.current_time: float | None = None
+
+    def add_lanes(self, lanes: int) -> None:
+        """Make room for the given number of lanes"""
+
+        added = lanes - len(self.step_counts)
+        if added <= 0:
+            return
+
+        self.step_counts.extend([0] * added)
+        self.step_velocity_sums.extend([0.0] * added)
+        self.step_changes_out.extend([0] * added)
+        self.step_changes_in.extend([0] * added)
+
+        def widen(array: npt.NDArray[Any]) -> npt.NDArray[Any]:
+            return np.hstack((array, np.zeros((len(array), added), dtype=array.dtype)))
+
+        self.lane_counts = widen(self.lane_counts)
+        self.lane_velocity_sums = widen(self.lane_velocity_sums)
+        self.lane_changes_out = widen(self.lane_changes_out)
+        self.lane_changes_in = widen(self.lane_changes_in)
+
+    def start_step(self, simulation_time: float) -> None:
+        """Finish the current step and start a new step at the given time"""
+
+        self.finish_step()
+        self.current_time = simulation_time
+
+    def finish_step(self) -> None:
+        """Store the aggregates of the current step and reset them"""
+
+        if self.current_time is None:
+            return
+
+        if self.steps >= len(self.times):
+            # Double the number of steps there is room for
+            self.times = np.concatenate((self.times, np.empty(len(self.times))))
+            self.lane_counts = np.vstack((self.lane_counts, np.zeros_like(self.lane_counts)))
+            self.lane_velocity_sums = np.vstack(
+                (self.lane_velocity_sums, np.zeros_like(self.lane_velocity_sums))
+            )
+            self.lane_changes_out = np.vstack(
+                (self.lane_changes_out, np.zeros_like(self.lane_changes_out))
+            )
+            self.lane_changes_in = np.vstack(
+                (self.lane_changes_in, np.zeros_like(self.lane_changes_in))
+            )
+
+        self.times[self.steps] = self.current_time
+        self.lane_counts[self.steps] = self.step_counts
+        self.lane_velocity_sums[self.steps] = self.step_velocity_sums
+        self.lane_changes_out[self.steps] = self.step_changes_out
+        self.lane_changes_in[self.steps] = self.step_changes_in
+        self.steps += 1
+
+        lanes = len(self.step_counts)
+        self.step_counts = [0] * lanes
+        self.step_velocity_sums = [0.0] * lanes
+        self.step_changes_out = [0] * lanes
+        self.step_changes_in = [0] * lanes
+        self.current_time = None
+
+    def add_vehicle(self, lane_index: int, velocity: float) -> None:
+        """Count a vehicle in the given lane in the current step"""
+
+        if lane_index >= len(self.step_counts):
+            self.add_lanes(lane_index + 1)
+        self.step_counts[lane_index] += 1
+        self.step_velocity_sums[lane_index] += velocity
+
+    def add_lane(self, lane_index: int, velocities: npt.NDArray[np.float64]) -> None:
+        """Count all vehicles of the given lane in the current step"""
+
+        if lane_index >= len(self.step_counts):
+            self.add_lanes(lane_index + 1)
+        self.step_counts[lane_index] += len(velocities)
+        self.step_velocity_sums[lane_index] += float(velocities.sum())
+
+    def add_lane_changes(
+        self, current_lane_index: int, new_lane_index: int, count: int = 1
+    ) -> None:
+        """Count vehicles changing from the current lane to the new lane in the current step"""
+
+        self.add_lanes(max(current_lane_index, new_lane_index) + 1)
+        self.step_changes_out[current_lane_index] += count
+        self.step_changes_in[new_lane_index] += count
+
+    def to_arrays(self) -> dict[str, npt.NDArray[Any]]:
+        """Return the metrics of all finished steps as arrays, with a row per step
+        and a column per lane. The mean velocity is nan for an empty lane."""
+
+        lane_counts = self.lane_counts[: self.steps]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lane_mean_velocities = self.lane_velocity_sums[: self.steps] / lane_counts
+
+        return {
+            "time": self.times[: self.steps],
+            "lane_counts": lane_counts,
+            "lane_mean_velocities": lane_mean_velocities,
+            "lane_changes_out": self.lane_changes_out[: self.steps],
+            "lane_changes_in": self.lane_changes_in[: self.steps],
+        }
+
+    def write(self, folder: str) -> None:
+        """Finish the current step and write the metrics to the metrics file in the folder"""
+
+        self.finish_step()
+        np.savez(os.path.join(folder, METRICS_FILE), **self.to_arrays())
+
+
+def read_metrics(folder: str) -> dict[str, npt.NDArray[Any]] | None:
+    """Return the metrics of the simulation in the folder, or None if there are none"""
+
+    metrics_file = os.path.join(folder, METRICS_FILE)
+    if not os.path.exists(metrics_file):
+        return None
+    with np.load(metrics_file) as arrays:
+        return dict(arrays)
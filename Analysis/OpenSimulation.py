@@ -4,6 +4,8 @@ import os
 from tkinter.filedialog import askdirectory, askopenfilename
 from typing import Any
 
+from Analysis.DataReader import data_exists
+
 
 def open_simulation(preference_file: str | None = None) -> tuple[str, str, dict[str, Any]]:
     """Open a simulation file and return the path to the file
@@ -26,7 +28,7 @@ def open_simulation(preference_file: str | None = None) -> tuple[str, str, dict[
     if preference_file:
         # Check if preference file exists
         preference_file_path = os.path.join(folder, preference_file)
-        if os.path.exists(preference_file_path):
+        if data_exists(preference_file_path):
             print("Opening preference file...")
             return preference_file_path, folder, simulation_settings
 
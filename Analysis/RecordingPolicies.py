@@ -0,0 +1,209 @@
+"""This module contains the recording policies,
+used to decide which vehicle data the DataCollector records.
+The policies are set with the "recording" entry of the simulation settings, e.g.
+{"every_steps": 10, "regions": [[1000, 2000]], "probe_fraction": 0.1, "velocity_change": 0.5}
+Policies are combined: a row is only recorded if every policy records it."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from Analysis.VehicleSlots import VehicleSlots
+
+
+class RecordingPolicy(ABC):
+    """Base class for recording policies, records everything.
+    A policy can leave out whole steps, and vehicles within a recorded step."""
+
+    def records_step(self, step: int) -> bool:
+        """Return whether the step with the given number is recorded"""
+        return True
+
+    def records_vehicle(
+        self, vehicle_id: int, lane_index: int, position: float, velocity: float
+    ) -> bool:
+        """Return whether the data of a vehicle is recorded in the current step"""
+        return True
+
+    def records_vehicles(
+        self,
+        vehicle_ids: npt.NDArray[np.int64],
+        lane_index: int,
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.bool_]:
+        """Return for every vehicle of a lane whether its data is recorded in the current step"""
+        return np.ones(len(vehicle_ids), dtype=np.bool_)
+
+    def vehicle_deleted(self, vehicle_id: int) -> None:
+        """Forget a vehicle that left the road"""
+
+    @abstractmethod
+    def settings(self) -> dict[str, Any]:
+        """Return the settings of the policy, as in the recording entry of the settings"""
+
+
+class StepRecordingPolicy(RecordingPolicy):
+    """Records every k-th step, starting with the first step."""
+
+    def __init__(self, every_steps: int) -> None:
+        if every_steps < 1:
+            raise ValueError(f"Can't record every {every_steps} steps")
+        self.every_steps = every_steps
+
+    def records_step(self, step: int) -> bool:
+        return step % self.every_steps == 0
+
+    def settings(self) -> dict[str, Any]:
+        return {"every_steps": self.every_steps}
+
+
+class RegionRecordingPolicy(RecordingPolicy):
+    """Records the vehicles inside the given intervals of the road, [start, end)."""
+
+    def __init__(self, regions: list[tuple[float, float]]) -> None:
+        self.regions = [(float(start), float(end)) for start, end in regions]
+
+    def records_vehicle(
+        self, vehicle_id: int, lane_index: int, position: float, velocity: float
+    ) -> bool:
+        return any(start <= position < end for start, end in self.regions)
+
+    def records_vehicles(
+        self,
+        vehicle_ids: npt.NDArray[np.int64],
+        lane_index: int,
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.bool_]:
+        recorded = np.zeros(len(positions), dtype=np.bool_)
+        for start, end in self.regions:
+            recorded |= (positions >= start) & (positions < end)
+        return recorded
+
+    def settings(self) -> dict[str, Any]:
+        return {"regions": [list(region) for region in self.regions]}
+
+
+class ProbeRecordingPolicy(RecordingPolicy):
+    """Records a sampled fraction of the vehicles, the probe vehicles.
+    Whether a vehicle is a probe only depends on its id (Fibonacci hashing),
+    so the probes are spread evenly over the vehicles and are the same in every engine."""
+
+    multiplier: int = 0x9E3779B97F4A7C15
+
+    def __init__(self, fraction: float) -> None:
+        if not 0 <= fraction <= 1:
+            raise ValueError(f"The probe fraction {fraction} is not between 0 and 1")
+        self.fraction = fraction
+        # A vehicle is a probe if the top 53 bits of its hash are below this threshold
+        self.threshold = int(fraction * 2**53)
+
+    def records_vehicle(
+        self, vehicle_id: int, lane_index: int, position: float, velocity: float
+    ) -> bool:
+        return ((vehicle_id * self.multiplier) % 2**64) >> 11 < self.threshold
+
+    def records_vehicles(
+        self,
+        vehicle_ids: npt.NDArray[np.int64],
+        lane_index: int,
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.bool_]:
+        # The unsigned multiplication wraps around, like the modulo of records_vehicle
+        hashes = vehicle_ids.astype(np.uint64) * np.uint64(self.multiplier)
+        return (hashes >> np.uint64(11)) < np.uint64(self.threshold)
+
+    def settings(self) -> dict[str, Any]:
+        return {"probe_fraction": self.fraction}
+
+
+class ChangeRecordingPolicy(RecordingPolicy):
+    """Records a vehicle when it changed lanes or its velocity changed by more than
+    the threshold since it was last recorded, and the first time it is seen.
+    The state of the vehicles on the road is stored in vehicle slots."""
+
+    def __init__(self, velocity_change: float, capacity: int = 1024) -> None:
+        self.velocity_change = velocity_change
+        # Lane and velocity of every vehicle when it was last recorded
+        # A lane of -2 means the vehicle was never recorded
+        self.states: VehicleSlots = VehicleSlots(
+            {"lane": np.int64, "velocity": np.float64}, capacity
+        )
+
+    def slot(self, vehicle_id: int) -> int:
+        """Return the slot of a vehicle, a new slot if the vehicle was never seen"""
+
+        slot = self.states.get(vehicle_id)
+        if slot is None:
+            slot = self.states.add(vehicle_id)
+            self.states.columns["lane"][slot] = -2
+        return slot
+
+    def records_vehicle(
+        self, vehicle_id: int, lane_index: int, position: float, velocity: float
+    ) -> bool:
+        slot = self.slot(vehicle_id)
+        lanes, velocities = self.states.columns["lane"], self.states.columns["velocity"]
+        if lanes[slot] == lane_index and abs(velocity - velocities[slot]) <= self.velocity_change:
+            return False
+
+        lanes[slot] = lane_index
+        velocities[slot] = velocity
+        return True
+
+    def records_vehicles(
+        self,
+        vehicle_ids: npt.NDArray[np.int64],
+        lane_index: int,
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.bool_]:
+        if len(vehicle_ids) == 0:
+            return np.zeros(0, dtype=np.bool_)
+
+        slots = np.fromiter(
+            (self.slot(vehicle_id) for vehicle_id in vehicle_ids.tolist()),
+            dtype=np.int64,
+            count=len(vehicle_ids),
+        )
+        lanes, last_velocities = self.states.columns["lane"], self.states.columns["velocity"]
+        recorded = (lanes[slots] != lane_index) | (
+            np.abs(velocities - last_velocities[slots]) > self.velocity_change
+        )
+        lanes[slots[recorded]] = lane_index
+        last_velocities[slots[recorded]] = velocities[recorded]
+        return recorded
+
+    def vehicle_deleted(self, vehicle_id: int) -> None:
+        # A vehicle that the earlier policies never let through has no slot
+        if vehicle_id in self.states:
+            self.states.pop(vehicle_id)
+
+    def settings(self) -> dict[str, Any]:
+        return {"velocity_change": self.velocity_change}
+
+
+def recording_policy_factory(recording: dict[str, Any]) -> list[RecordingPolicy]:
+    """Factory function for creating the recording policies of the recording settings.
+    The change policy comes last, so it only sees the rows all other policies record."""
+
+    unknown = set(recording) - {"every_steps", "regions", "probe_fraction", "velocity_change"}
+    if unknown:
+        raise ValueError(f"Unknown recording settings: {', '.join(sorted(unknown))}")
+
+    policies: list[RecordingPolicy] = []
+    if "every_steps" in recording:
+        policies.append(StepRecordingPolicy(recording["every_steps"]))
+    if "regions" in recording:
+        policies.append(RegionRecordingPolicy(recording["regions"]))
+    if "probe_fraction" in recording:
+        policies.append(ProbeRecordingPolicy(recording["probe_fraction"]))
+    if "velocity_change" in recording:
+        policies.append(ChangeRecordingPolicy(recording["velocity_change"]))
+
+    return policies
@@ -0,0 +1,32 @@
+"""Implements the SpawnTimes class, the spawn times of the vehicles on the road"""
+from __future__ import annotations
+
+import numpy as np
+
+from Analysis.VehicleSlots import VehicleSlots
+
+
+class SpawnTimes:
+    """The spawn time of every vehicle on the road, stored in vehicle slots,
+    so the memory is proportional to the number of vehicles on the road at the same time."""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.times: VehicleSlots = VehicleSlots({"spawn_time": np.float64}, capacity)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __contains__(self, vehicle_id: int) -> bool:
+        return vehicle_id in self.times
+
+    def add(self, vehicle_id: int, spawn_time: float) -> None:
+        """Store the spawn time of a vehicle"""
+
+        # The slot comes first, adding it can replace the arrays of the columns
+        slot = self.times.add(vehicle_id)
+        self.times.columns["spawn_time"][slot] = spawn_time
+
+    def pop(self, vehicle_id: int) -> float:
+        """Remove the spawn time of a vehicle and return it"""
+
+        return float(self.times.columns["spawn_time"][self.times.pop(vehicle_id)])
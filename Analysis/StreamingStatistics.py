@@ -0,0 +1,305 @@
+"""Statistics of a stream of values (e.g., the travel times) that are updated one value at a time,
+without keeping the values. The statistics of different simulations can be merged,
+so statistics over replicas or a sweep don't need the data of the simulations.
+The statistics are stored as JSON, in travel_time_statistics.json for the travel times."""
+from __future__ import annotations
+
+import json
+import math
+import os
+from typing import Any, Iterable
+
+STATISTICS_FILE = "travel_time_statistics.json"
+
+
+class RunningMoments:
+    """Count, mean, variance, minimum and maximum, with Welford's algorithm"""
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean: float = 0.0
+        # Sum of the squared differences from the mean
+        self.m2: float = 0.0
+        self.minimum: float = math.inf
+        self.maximum: float = -math.inf
+
+    def update(self, value: float) -> None:
+        """Add a value"""
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: RunningMoments) -> None:
+        """Add the values of the other moments (Chan et al.)"""
+
+        count = self.count + other.count
+        if count == 0:
+            return
+
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self) -> float:
+        """Population variance, like np.var"""
+        return self.m2 / self.count if self.count > 0 else math.nan
+
+    @property
+    def std_dev(self) -> float:
+        """Population standard deviation, like np.std"""
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the state as a JSON serializable dict"""
+
+        # JSON has no infinity, an empty stream has no minimum and maximum
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "minimum": self.minimum if self.count > 0 else None,
+            "maximum": self.maximum if self.count > 0 else None,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict[str, Any]) -> RunningMoments:
+        """Create the moments from the state of to_dict"""
+
+        moments = cls()
+        moments.count = state["count"]
+        moments.mean = state["mean"]
+        moments.m2 = state["m2"]
+        if moments.count > 0:
+            moments.minimum = state["minimum"]
+            moments.maximum = state["maximum"]
+        return moments
+
+
+class Histogram:
+    """Histogram with bins of a fixed width starting at 0, the bins are added as needed.
+    Negative values are counted in the first bin."""
+
+    def __init__(self, bin_width: float) -> None:
+        self.bin_width: float = bin_width
+        self.counts: list[int] = []
+
+    def update(self, value: float) -> None:
+        """Add a value"""
+
+        index = max(int(value // self.bin_width), 0)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+
+    def merge(self, other: Histogram) -> None:
+        """Add the counts of the other histogram, which must have the same bin width"""
+
+        if other.bin_width != self.bin_width:
+            raise ValueError(
+                f"Can't merge histograms with bin widths {self.bin_width} and {other.bin_width}"
+            )
+
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+    def bin_edges(self) -> list[float]:
+        """Return the edges of the bins, one more than the number of bins"""
+        return [index * self.bin_width for index in range(len(self.counts) + 1)]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the state as a JSON serializable dict"""
+        return {"bin_width": self.bin_width, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, state: dict[str, Any]) -> Histogram:
+        """Create the histogram from the state of to_dict"""
+
+        histogram = cls(state["bin_width"])
+        histogram.counts = list(state["counts"])
+        return histogram
+
+
+class QuantileSketch:
+    """Quantile sketch with logarithmic buckets (DDSketch).
+    Every quantile of the positive values is within the relative accuracy of the exact quantile,
+    and the sketches of different streams are merged by adding the bucket counts.
+    Values that are not positive are counted together and returned as 0."""
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"The relative accuracy {relative_accuracy} is not between 0 and 1")
+
+        self.relative_accuracy: float = relative_accuracy
+        self.gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma: float = math.log(self.gamma)
+        # Bucket i counts the values in (gamma^(i-1), gamma^i]
+        self.buckets: dict[int, int] = {}
+        self.zero_count: int = 0
+        self.count: int = 0
+
+    def update(self, value: float) -> None:
+        """Add a value"""
+
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Add the values of the other sketch, which must have the same relative accuracy"""
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                "Can't merge sketches with relative accuracies "
+                f"{self.relative_accuracy} and {other.relative_accuracy}"
+            )
+
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """Return the q-quantile (0 <= q <= 1) of the values, nan if there are none"""
+
+        if self.count == 0:
+            return math.nan
+
+        # Rank of the value, counted from 0 like np.quantile with the lower method
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # The value in the middle of the bucket, relative to both bucket edges
+                return 2 * self.gamma**index / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the state as a JSON serializable dict"""
+
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            # JSON only has string keys
+            "buckets": {str(index): count for index, count in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict[str, Any]) -> QuantileSketch:
+        """Create the sketch from the state of to_dict"""
+
+        sketch = cls(state["relative_accuracy"])
+        sketch.buckets = {int(index): count for index, count in state["buckets"].items()}
+        sketch.zero_count = state["zero_count"]
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
+
+
+class StreamingStatistics:
+    """Moments, histogram and quantile sketch of a stream of values"""
+
+    def __init__(self, bin_width: float = 1.0, relative_accuracy: float = 0.01) -> None:
+        self.moments: RunningMoments = RunningMoments()
+        self.histogram: Histogram = Histogram(bin_width)
+        self.sketch: QuantileSketch = QuantileSketch(relative_accuracy)
+
+    def update(self, value: float) -> None:
+        """Add a value"""
+
+        self.moments.update(value)
+        self.histogram.update(value)
+        self.sketch.update(value)
+
+    def merge(self, other: StreamingStatistics) -> None:
+        """Add the values of the other statistics"""
+
+        self.moments.merge(other.moments)
+        self.histogram.merge(other.histogram)
+        self.sketch.merge(other.sketch)
+
+    def quantile(self, q: float) -> float:
+        """Return the approximate q-quantile of the values, within the minimum and maximum"""
+
+        if self.moments.count == 0:
+            return math.nan
+        return min(max(self.sketch.quantile(q), self.moments.minimum), self.moments.maximum)
+
+    def summary(self) -> dict[str, float]:
+        """Return the main statistics of the values"""
+
+        return {
+            "count": self.moments.count,
+            "min": self.moments.minimum if self.moments.count > 0 else math.nan,
+            "max": self.moments.maximum if self.moments.count > 0 else math.nan,
+            "mean": self.moments.mean if self.moments.count > 0 else math.nan,
+            "std_dev": self.moments.std_dev,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the state as a JSON serializable dict"""
+
+        return {
+            "moments": self.moments.to_dict(),
+            "histogram": self.histogram.to_dict(),
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict[str, Any]) -> StreamingStatistics:
+        """Create the statistics from the state of to_dict"""
+
+        statistics = cls()
+        statistics.moments = RunningMoments.from_dict(state["moments"])
+        statistics.histogram = Histogram.from_dict(state["histogram"])
+        statistics.sketch = QuantileSketch.from_dict(state["sketch"])
+        return statistics
+
+    def write(self, folder: str) -> None:
+        """Write the statistics to the statistics file in the folder"""
+
+        with open(os.path.join(folder, STATISTICS_FILE), "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file)
+
+
+def read_statistics(folder: str) -> StreamingStatistics | None:
+    """Return the travel time statistics of the simulation in the folder, or None if there are none"""
+
+    statistics_file = os.path.join(folder, STATISTICS_FILE)
+    if not os.path.exists(statistics_file):
+        return None
+    with open(statistics_file, "r", encoding="utf-8") as file:
+        return StreamingStatistics.from_dict(json.load(file))
+
+
+def merge_statistics(statistics: Iterable[StreamingStatistics]) -> StreamingStatistics:
+    """Return the statistics of all values of the given statistics"""
+
+    merged: StreamingStatistics | None = None
+    for other in statistics:
+        if merged is None:
+            # Copy the first statistics, so the bin width and accuracy of the inputs are kept
+            merged = StreamingStatistics.from_dict(other.to_dict())
+        else:
+            merged.merge(other)
+    return merged if merged is not None else StreamingStatistics()
@@ -0,0 +1,57 @@
+"""Implements the VehicleSlots class, per vehicle values of the vehicles on the road"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+
+class VehicleSlots:
+    """Values of every vehicle on the road, stored in the slots of an array per column.
+    The slot of a vehicle is freed when the vehicle leaves the road and reused by a new vehicle,
+    so the memory is proportional to the number of vehicles on the road at the same time."""
+
+    def __init__(self, columns: dict[str, npt.DTypeLike], capacity: int = 1024) -> None:
+        # Array of every column by name, indexed by slot
+        self.columns: dict[str, npt.NDArray[Any]] = {
+            name: np.empty(capacity, dtype=dtype) for name, dtype in columns.items()
+        }
+        self.capacity: int = capacity
+        # Slot of every vehicle on the road by vehicle id
+        self.slots: dict[int, int] = {}
+        # Slots that are not used by a vehicle, below the number of slots in use so far
+        self.free_slots: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, vehicle_id: int) -> bool:
+        return vehicle_id in self.slots
+
+    def get(self, vehicle_id: int) -> int | None:
+        """Return the slot of a vehicle, None if the vehicle has no slot"""
+
+        return self.slots.get(vehicle_id)
+
+    def add(self, vehicle_id: int) -> int:
+        """Give a vehicle a slot and return it, the values of the slot are not set"""
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.slots)
+            if slot >= self.capacity:
+                self.capacity *= 2
+                for name, values in self.columns.items():
+                    self.columns[name] = np.concatenate((values, np.empty_like(values)))
+
+        self.slots[vehicle_id] = slot
+        return slot
+
+    def pop(self, vehicle_id: int) -> int:
+        """Free the slot of a vehicle and return it, its values stay until the slot is reused"""
+
+        slot = self.slots.pop(vehicle_id)
+        self.free_slots.append(slot)
+        return slot
@@ -1,12 +1,14 @@
 # type: ignore
 """File that contains the function to show an animation of the simulation using pygame."""
 import random
+from typing import Any
 
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
 import pygame
 
+from Analysis.DataReader import load_window, read_time_index
 from Analysis.OpenSimulation import open_simulation
 
 
@@ -18,18 +20,28 @@ def show_animation():
 
     print("Opening simulation...")
 
-    path, _, simulation_settings = open_simulation(preference_file="vehicle_data.csv")
+    _, folder, simulation_settings = open_simulation(preference_file="vehicle_data.csv")
 
     ##################################
 
     print("Reading data...")
 
-    # Read the data from the file, ignore the first row which is a header
-    data: pd.DataFrame = pd.read_csv(path, header=0)
-
-    # Check if data is empty if so raise an error
-    if len(data) == 0:
-        raise ValueError(f"Data {data} is empty.")
+    # The data is read in windows around the current frame, so only the time index is read here
+    time_index = read_time_index(folder)
+    if time_index is not None:
+        if not time_index["blocks"]:
+            raise ValueError(f"There is no vehicle data in {folder}.")
+        first_time: float = time_index["blocks"][0]["start_time"]
+        last_time: float = time_index["blocks"][-1]["end_time"]
+    else:
+        # Without a time index (older simulations) every window reads all data
+        times = load_window(folder, -np.inf, np.inf, columns=["time"])["time"]
+        if len(times) == 0:
+            raise ValueError(f"There is no vehicle data in {folder}.")
+        first_time, last_time = times.min(), times.max()
+
+    # Duration of a window of the data
+    window_duration = 60
 
     print("Data read.")
 
@@ -163,8 +175,63 @@ def show_animation():
         )
         screen.blit(text, (screen_width - x_right_offset - 150, 5))
 
-    def update(frame: int) -> None:
-        frame_vehicle_data: pd.DataFrame = data[data["time"] == frame]
+    # Window number k has the frames from first_time + k * window_duration up to the next window
+    windows = int((last_time - first_time) // window_duration) + 1
+    # The data of the current window, with the times of its frames, and the current frame
+    window: dict[str, Any] = {}
+
+    def load_frames(number: int, backward: bool = False) -> None:
+        """Load a window and show its first frame, or its last frame when going backward.
+        Empty windows are skipped in the direction of travel, looping around the data."""
+
+        while True:
+            number %= windows
+            start_time = first_time + number * window_duration
+            data: pd.DataFrame = load_window(folder, start_time, start_time + window_duration)
+            if len(data) > 0:
+                break
+            number += -1 if backward else 1
+
+        times = data["time"].to_numpy()
+        frames: npt.NDArray[np.float_] = np.unique(times)
+        window.update(
+            number=number,
+            data=data,
+            frames=frames,
+            # The rows of a frame are a slice of the data, which is ordered by time
+            starts=np.searchsorted(times, frames, side="left"),
+            ends=np.searchsorted(times, frames, side="right"),
+            frame=len(frames) - 1 if backward else 0,
+        )
+
+    def seek(time: float) -> None:
+        """Show the first frame at or after the time, the time loops around the data"""
+
+        time = first_time + (time - first_time) % (last_time - first_time + time_step)
+        load_frames(int((time - first_time) // window_duration))
+        window["frame"] = min(
+            int(np.searchsorted(window["frames"], time)), len(window["frames"]) - 1
+        )
+
+    def skip_frames(count: int) -> None:
+        """Skip a number of frames forward (or backward if negative), across windows"""
+
+        frame = window["frame"] + count
+        while frame >= len(window["frames"]):
+            frame -= len(window["frames"])
+            load_frames(window["number"] + 1)
+        while frame < 0:
+            load_frames(window["number"] - 1, backward=True)
+            frame += len(window["frames"])
+        window["frame"] = frame
+
+    def current_time() -> float:
+        return window["frames"][window["frame"]]
+
+    def update() -> None:
+        frame_vehicle_data: pd.DataFrame = window["data"].iloc[
+            window["starts"][window["frame"]] : window["ends"][window["frame"]]
+        ]
 
         # Delete vehicles that are not in the frame
         for vehicle_id in list(vehicles_rectangles.keys()):
@@ -197,7 +264,12 @@ def show_animation():
 
             pygame.draw.rect(screen, color, vehicles_rectangles[vehicle_id], 2)
 
-    frames: npt.NDArray[np.float_] = np.unique(data["time"])
+    # Frames are recorded every frame_step seconds, for the frame numbers
+    frame_step = time_step * simulation_settings.get("recording", {}).get("every_steps", 1)
+    total_frames = round((last_time - first_time) / frame_step) + 1
+
+    def frame_number() -> int:
+        return round((current_time() - first_time) / frame_step)
 
     running = True
     paused = False
@@ -206,9 +278,9 @@ def show_animation():
 
     print("Starting animation...")
 
-    frame_num = 0
+    load_frames(0)
     while running:
-        print(f"Frame: {frame_num} / {len(frames)}", end="\r")
+        print(f"Frame: {frame_number()} / {total_frames}", end="\r")
         # Handle events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -217,7 +289,7 @@ def show_animation():
             if event.type == pygame.KEYDOWN:
                 # Check if the user pressed the spacebar
                 if event.key == pygame.K_ESCAPE:
-                    frame_num = 0
+                    load_frames(0)
                     paused = False
                     reverse = False
                     speed = 1
@@ -235,54 +307,23 @@ def show_animation():
                     speed *= 1.1
                     if speed > 100:
                         speed = 100
+                # Seeking only reads the window of the new time, the times loop around the data
                 if event.key == pygame.K_LEFTBRACKET:
-                    # Skip 10% frames back
-                    decrease = int(len(frames) * 0.1)
-                    if frame_num - decrease < 0:
-                        # If the frame number is smaller than 0 loop back
-                        # to the end minus the decrease that is left
-                        frame_num = len(frames) - (decrease - frame_num)
-                    else:
-                        frame_num -= decrease
+                    # Skip 10% of the time back
+                    seek(current_time() - 0.1 * (last_time - first_time))
                 if event.key == pygame.K_RIGHTBRACKET:
-                    # Skip 10% frames forward
-                    increase = int(len(frames) * 0.1)
-                    if frame_num + increase >= len(frames):
-                        # If the frame number is larger than the number of frames
-                        # loop back to the beginning plus the increase that is left
-                        frame_num = increase - (len(frames) - frame_num)
-                    else:
-                        frame_num += increase
+                    # Skip 10% of the time forward
+                    seek(current_time() + 0.1 * (last_time - first_time))
                 if event.key == pygame.K_COMMA:
                     # Skip 10 frames back
-                    if frame_num - 10 < 0:
-                        # If the frame number is smaller than 0 loop back
-                        # to the end minus the decrease that is left
-                        frame_num = len(frames) - (10 - frame_num)
-                    else:
-                        frame_num -= 10
+                    skip_frames(-10)
                 if event.key == pygame.K_PERIOD:
                     # Skip 10 frames forward
-                    if frame_num + 10 >= len(frames):
-                        # If the frame number is larger than the number of frames
-                        # loop back to the beginning plus the increase that is left
-                        frame_num = 10 - (len(frames) - frame_num)
-                    else:
-                        frame_num += 10
+                    skip_frames(10)
                 if event.key == pygame.K_PAGEUP:
-                    if frame_num + 1 >= len(frames):
-                        # If the frame number is larger than the number of frames
-                        # loop back to the beginning plus the increase that is left
-                        frame_num = 1 - (len(frames) - frame_num)
-                    else:
-                        frame_num += 1
+                    skip_frames(1)
                 if event.key == pygame.K_PAGEDOWN:
-                    if frame_num - 1 < 0:
-                        # If the frame number is smaller than 0 loop back
-                        # to the end minus the decrease that is left
-                        frame_num = len(frames) - (1 - frame_num)
-                    else:
-                        frame_num -= 1
+                    skip_frames(-1)
                 if event.key == pygame.K_r:
                     paused = False
                     reverse = False
@@ -290,22 +331,17 @@ def show_animation():
 
         draw_lanes()
         draw_title()
-        draw_time(frames[frame_num])
+        draw_time(current_time())
         draw_information(paused, reverse, speed)
-        draw_framenum(frame_num, len(frames))
+        draw_framenum(frame_number(), total_frames)
         draw_axis()
         # Update and draw
-        update(frames[frame_num])
+        update()
         # Update screen
         pygame.display.flip()
 
         if not paused:
-            if reverse:
-                frame_num -= 1
-            else:
-                frame_num += 1
-            if frame_num >= len(frames):
-                frame_num = 0
+            skip_frames(-1 if reverse else 1)
 
         # Wait
         pygame.time.wait(int(time_step * 1000 / speed))
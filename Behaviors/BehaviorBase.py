@@ -2,35 +2,137 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
+import numpy as np
+import numpy.typing as npt
+
+from Behaviors.LaneChanging import (
+    calculate_save_distance_n_seconds_rule,
+    get_overtake_lane,
+    get_return_lane,
+)
 from Road.Road import Road
 
 if TYPE_CHECKING:
-    from Road.Lane import Lane
+    from Road.ArrayLane import ArrayLane
     from Vehicles.Vehicle import Vehicle
 
 
 class Behavior(ABC):
     """Base class for behaviors."""
 
+    # Subclasses declare their attributes in __slots__, so behaviors do not carry a __dict__.
+    # rng is the generator of the random numbers of the behavior, shared by the behaviors
+    # of a simulation, so a seeded simulation is reproducible.
+    __slots__ = ("rng",)
+
+    # Attributes that the vectorized engine stores per vehicle in the parameter table,
+    # behaviors without them are not supported by the vectorized engine
+    batch_parameters: tuple[str, ...] = ()
+    # Parameter used as the n seconds rule time when changing lanes, None if the behavior never changes lanes
+    safe_time_parameter: str | None = None
+    # Factor applied to the n seconds rule time when returning to the lane below
+    return_safe_time_factor: float = 1.0
+
     @abstractmethod
     def __init__(self) -> None:
         ...
 
-    @abstractmethod
-    def update(self, vehicle: Vehicle, road: Road, delta_t: float):
+    def update(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
         """Update the vehicle's state and position."""
 
+        new_lane_index = self.lane_change_intent(vehicle, road, delta_t)
+        if new_lane_index is not None:
+            road.change_vehicle_lane(vehicle=vehicle, new_lane_index=new_lane_index)
+
+        vehicle.velocity = self.next_velocity(
+            vehicle, road, delta_t, changed_lane=new_lane_index is not None
+        )
+
+    def lane_change_intent(self, vehicle: Vehicle, road: Road, delta_t: float) -> int | None:
+        """Return the lane the vehicle wants and is able to change to,
+        or None if it stays in its lane. The road is not changed.
+        The vehicle returns to the lane below if it keeps the safe distance there (n seconds
+        rule with the return safe time), else it overtakes if it is too close to its leading
+        vehicle and the lane above is safe. The synchronous and vectorized engines decide with
+        the same rule for all vehicles at once, so they only support behaviors that keep it."""
+
+        if self.safe_time_parameter is None:
+            return None
+        safe_time = self.lane_change_safe_time()
+
+        # First check if the vehicle can return to the lane below
+        new_lane_index = get_return_lane(road, vehicle, safe_time * self.return_safe_time_factor)
+        if new_lane_index is not None:
+            return new_lane_index
+
+        # Now check if the vehicle is too close to the leading vehicle
+        current_lane_index = road.get_current_lane_index(vehicle)
+        lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
+        if lead_vehicle:
+            save_distance = calculate_save_distance_n_seconds_rule(vehicle, safe_time)
+            if lead_vehicle.position - vehicle.position < save_distance:
+                # If the vehicle is too close, check if it can overtake
+                return get_overtake_lane(road, vehicle, safe_time)
+
+        return None
+
+    @classmethod
+    def has_default_lane_changes(cls) -> bool:
+        """Return whether the behavior changes lanes with the rule of lane_change_intent,
+        the only rule the batched lane change decisions of the road implement."""
+
+        return cls.lane_change_intent is Behavior.lane_change_intent
+
     @abstractmethod
-    def set_initial_velocity(self, vehicle: Vehicle):
-        """Set the vehicle's initial velocity."""
+    def next_velocity(
+        self, vehicle: Vehicle, road: Road, delta_t: float, changed_lane: bool
+    ) -> float:
+        """Return the new velocity of the vehicle in its current lane,
+        changed_lane tells whether it changed lanes this step. The vehicle is not changed."""
 
     @abstractmethod
-    def considers_lane_safe(self, vehicle: Vehicle, lane: Lane, delta_t: float) -> bool:
-        """Return whether the lane is safe to change to."""
+    def set_initial_velocity(self, vehicle: Vehicle):
+        """Set the vehicle's initial velocity."""
 
     @staticmethod
     @abstractmethod
     def standard_parameters() -> list[tuple[str, str, float, str]]:
         """Return the standard parameters for the behavior model."""
+
+    def lane_change_safe_time(self) -> float:
+        """Return the n seconds rule time used when changing lanes,
+        nan if the behavior never changes lanes."""
+
+        if self.safe_time_parameter is None:
+            return float("nan")
+        return getattr(self, self.safe_time_parameter)
+
+    @classmethod
+    def batch_parameter_dtype(cls) -> np.dtype[Any]:
+        """Return the dtype of the parameter table used by the vectorized engine."""
+
+        return np.dtype(
+            [("length", np.float64)] + [(name, np.float64) for name in cls.batch_parameters]
+        )
+
+    @classmethod
+    def batch_parameter_values(cls, vehicle: Vehicle) -> tuple[float, ...]:
+        """Return the row of the parameter table for the given vehicle."""
+
+        return (vehicle.length,) + tuple(
+            getattr(vehicle.behavior_model, name) for name in cls.batch_parameters
+        )
+
+    @classmethod
+    def calculate_lane_velocities(
+        cls,
+        lane: ArrayLane,
+        changed_lane: npt.NDArray[np.bool_],
+        delta_t: float,
+        rng: np.random.Generator,
+    ) -> npt.NDArray[np.float64]:
+        """Return the new velocities of all vehicles in a lane of the vectorized engine."""
+
+        raise NotImplementedError(f"{cls.__name__} does not support the vectorized engine")
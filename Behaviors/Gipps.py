@@ -1,15 +1,12 @@
 from __future__ import annotations
 
+from typing import Mapping
+
 import numpy as np
+import numpy.typing as npt
 
 from Behaviors.BehaviorBase import Behavior
-from Behaviors.LaneChanging import (
-    calculate_save_distance_n_seconds_rule,
-    is_outside_n_seconds_rule,
-    overtake_if_possible,
-    return_if_possible,
-)
-from Road.Lane import Lane
+from Road.ArrayLane import ArrayLane
 from Road.Road import Road
 from Vehicles.Vehicle import Vehicle
 
@@ -17,6 +14,26 @@ from Vehicles.Vehicle import Vehicle
 class GippsBehavior(Behavior):
     """Implementation of the Gipps behavior model."""
 
+    __slots__ = (
+        "maximum_acceleration",
+        "maximum_deceleration",
+        "desired_velocity",
+        "apparent_reaction_time",
+        "comfortable_distance",
+        "velocities",
+    )
+
+    initial_velocity_deviation: float = 0.5  # m/s
+
+    batch_parameters = (
+        "maximum_acceleration",
+        "maximum_deceleration",
+        "desired_velocity",
+        "apparent_reaction_time",
+        "comfortable_distance",
+    )
+    safe_time_parameter = "apparent_reaction_time"
+
     @staticmethod
     def standard_parameters() -> list[tuple[str, str, float, str]]:
         """Return the standard parameters for the Gipps behavior model."""
@@ -35,52 +52,32 @@ class GippsBehavior(Behavior):
         desired_velocity: float,
         apparent_reaction_time: float,
         comfortable_distance: float,
+        *,
+        rng: np.random.Generator,
     ) -> None:
+        self.rng = rng
         self.maximum_acceleration = maximum_acceleration
         self.maximum_deceleration = maximum_deceleration
         self.desired_velocity = desired_velocity
         self.apparent_reaction_time = apparent_reaction_time
         self.comfortable_distance = comfortable_distance  # m
-        self.initial_velocity_deviation = 0.5  # m/s
 
         self.velocities = (0, 0, 0)  # Acceleration, Desired Velocity, Safe Velocity
 
     def set_initial_velocity(self, vehicle: Vehicle) -> None:
         """Set the vehicle's initial velocity."""
 
-        vehicle.velocity = np.random.normal(self.desired_velocity, self.initial_velocity_deviation)
+        vehicle.velocity = self.rng.normal(self.desired_velocity, self.initial_velocity_deviation)
 
-    def set_vehicle_velocity(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
-        """Set the vehicle's velocity."""
+    def next_velocity(
+        self, vehicle: Vehicle, road: Road, delta_t: float, changed_lane: bool
+    ) -> float:
+        """Return the vehicle's new velocity."""
 
         current_lane_index = road.get_current_lane_index(vehicle)
         lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
         self.velocities = self.calculate_new_velocities(vehicle, lead_vehicle, delta_t)
-        vehicle.velocity = min(self.velocities)
-
-    def update(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
-        """Update the vehicle's state and position."""
-
-        if return_if_possible(road, vehicle, delta_t):
-            self.set_vehicle_velocity(vehicle, road, delta_t)
-            return
-
-        # Now check if the vehicle is too close to the leading vehicle
-        current_lane_index = road.get_current_lane_index(vehicle)
-        lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
-
-        if lead_vehicle:
-            save_distance = calculate_save_distance_n_seconds_rule(
-                vehicle, self.apparent_reaction_time
-            )
-            if lead_vehicle.position - vehicle.position < save_distance:
-                # If the vehicle is too close, check if it can overtake
-                if overtake_if_possible(road, vehicle, delta_t):
-                    self.set_vehicle_velocity(vehicle, road, delta_t)
-                    return
-
-        self.set_vehicle_velocity(vehicle, road, delta_t)
-        return
+        return min(self.velocities)
 
     def calculate_new_velocities(
         self, vehicle: Vehicle, lead_vehicle: Vehicle | None, delta_t: float
@@ -111,13 +108,61 @@ class GippsBehavior(Behavior):
         """Calculate the safe speed for the vehicle."""
 
         # safe_speed = −bT+ sqrt(b^2T^2+2b(s−s0)+vl^2)
-        return self.maximum_acceleration * delta_t + (
+        # The argument of the square root is negative when the vehicle is closer than s0
+        # to the leading vehicle, in that case the square root is taken as 0
+        return self.maximum_acceleration * delta_t + max(
             (self.maximum_acceleration**2) * (delta_t**2)
             + 2 * self.maximum_acceleration * (leading_distance - self.comfortable_distance)
-            + leading_velocity**2
+            + leading_velocity**2,
+            0,
         ) ** (0.5)
 
-    def considers_lane_safe(self, vehicle: Vehicle, lane: Lane, delta_t: float) -> bool:
-        """Return whether the lane is safe to change to using the n seconds rule."""
+    @staticmethod
+    def calculate_velocities(
+        velocities: npt.NDArray[np.float64],
+        leading_distances: npt.NDArray[np.float64],
+        leading_velocities: npt.NDArray[np.float64],
+        parameters: Mapping[str, npt.NDArray[np.float64]],
+        delta_t: float,
+    ) -> npt.NDArray[np.float64]:
+        """Calculate the new Gipps velocity of many vehicles at once.
+        The parameters map every name in batch_parameters to an array with a value per vehicle,
+        e.g. the parameter table of the vectorized engine.
+        A vehicle without a leading vehicle should get an infinite leading distance."""
+
+        maximum_acceleration = parameters["maximum_acceleration"]
+        acceleration_step = maximum_acceleration * delta_t
+
+        # Radicand of the safe speed, clipped at 0 so the square root never yields NaN
+        radicand = leading_distances - parameters["comfortable_distance"]
+        radicand *= 2 * maximum_acceleration
+        radicand += acceleration_step * acceleration_step
+        radicand += leading_velocities * leading_velocities
+        np.maximum(radicand, 0, out=radicand)
+        safe_velocities = acceleration_step + np.sqrt(radicand)
 
-        return is_outside_n_seconds_rule(vehicle, lane, self.apparent_reaction_time)
+        # min [v + aΔt, v0, vsafe(s, vl )] gipps equation
+        new_velocities = velocities + acceleration_step
+        np.minimum(new_velocities, parameters["desired_velocity"], out=new_velocities)
+        np.minimum(new_velocities, safe_velocities, out=new_velocities)
+        return new_velocities
+
+    @classmethod
+    def calculate_lane_velocities(
+        cls,
+        lane: ArrayLane,
+        changed_lane: npt.NDArray[np.bool_],
+        delta_t: float,
+        rng: np.random.Generator,
+    ) -> npt.NDArray[np.float64]:
+        """Return the new velocities of all vehicles in a lane of the vectorized engine."""
+
+        leader_positions, leader_velocities, leader_lengths = lane.leaders()
+
+        return cls.calculate_velocities(
+            velocities=lane.velocities,
+            leading_distances=(leader_positions - leader_lengths) - lane.positions,
+            leading_velocities=leader_velocities,
+            parameters=lane.parameters,
+            delta_t=delta_t,
+        )
@@ -3,17 +3,13 @@
 from __future__ import annotations
 
 from math import sqrt
+from typing import Mapping
 
 import numpy as np
+import numpy.typing as npt
 
 from Behaviors.BehaviorBase import Behavior
-from Behaviors.LaneChanging import (
-    calculate_save_distance_n_seconds_rule,
-    is_outside_n_seconds_rule,
-    overtake_if_possible,
-    return_if_possible,
-)
-from Road.Lane import Lane
+from Road.ArrayLane import ArrayLane
 from Road.Road import Road
 from Vehicles.Vehicle import Vehicle
 
@@ -21,6 +17,29 @@ from Vehicles.Vehicle import Vehicle
 class IDMBehavior(Behavior):
     """Implementation of the IDM behavior model."""
 
+    __slots__ = (
+        "desired_velocity",
+        "time_headway",
+        "max_acceleration",
+        "comfortable_braking_deceleration",
+        "minimum_spacing",
+        "acceleration_exponent",
+        "dynamic_gap_denominator",
+    )
+
+    initial_velocity_deviation: float = 0.5  # m/s
+
+    batch_parameters = (
+        "desired_velocity",
+        "time_headway",
+        "max_acceleration",
+        "comfortable_braking_deceleration",
+        "minimum_spacing",
+        "acceleration_exponent",
+        "dynamic_gap_denominator",
+    )
+    safe_time_parameter = "time_headway"
+
     @staticmethod
     def standard_parameters() -> list[tuple[str, str, float, str]]:
         """Return the standard parameters for the IDM behavior model."""
@@ -41,48 +60,35 @@ class IDMBehavior(Behavior):
         comfortable_braking_deceleration: float,
         minimum_spacing: float,
         acceleration_exponent: float,
+        *,
+        rng: np.random.Generator,
     ) -> None:
+        self.rng = rng
         self.desired_velocity = desired_velocity
         self.time_headway = time_headway
         self.max_acceleration = max_acceleration
         self.comfortable_braking_deceleration = comfortable_braking_deceleration
         self.minimum_spacing = minimum_spacing
         self.acceleration_exponent = acceleration_exponent
-        self.initial_velocity_deviation = 0.5
+
+        # 2 * sqrt(a * b) is constant for a vehicle, so calculate it once
+        self.dynamic_gap_denominator = 2 * sqrt(
+            self.max_acceleration * self.comfortable_braking_deceleration
+        )
 
     def set_initial_velocity(self, vehicle: Vehicle) -> None:
         """Set the vehicle's initial velocity."""
 
-        vehicle.velocity = np.random.normal(self.desired_velocity, self.initial_velocity_deviation)
-
-    def update(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
-        """Update the vehicle's state and position."""
-
-        if return_if_possible(road, vehicle, delta_t):
-            self.set_vehicle_velocity(vehicle, road, delta_t)
-            return
-
-        # Now check if the vehicle is too close to the leading vehicle
-        current_lane_index = road.get_current_lane_index(vehicle)
-        lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
-
-        if lead_vehicle:
-            save_distance = calculate_save_distance_n_seconds_rule(vehicle, self.time_headway)
-            if lead_vehicle.position - vehicle.position < save_distance:
-                # If the vehicle is too close, check if it can overtake
-                if overtake_if_possible(road, vehicle, delta_t):
-                    self.set_vehicle_velocity(vehicle, road, delta_t)
-                    return
-
-        self.set_vehicle_velocity(vehicle, road, delta_t)
-        return
+        vehicle.velocity = self.rng.normal(self.desired_velocity, self.initial_velocity_deviation)
 
-    def set_vehicle_velocity(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
-        """Set the vehicle's velocity."""
+    def next_velocity(
+        self, vehicle: Vehicle, road: Road, delta_t: float, changed_lane: bool
+    ) -> float:
+        """Return the vehicle's new velocity."""
 
         current_lane_index = road.get_current_lane_index(vehicle)
         lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
-        vehicle.velocity = max(
+        return max(
             0,
             vehicle.velocity + self.calculate_acceleration(vehicle, lead_vehicle) * delta_t,
         )
@@ -104,7 +110,7 @@ class IDMBehavior(Behavior):
             vehicle.velocity * self.time_headway
             + vehicle.velocity
             * (vehicle.velocity - lead_vehicle.velocity)
-            / (2 * sqrt(self.max_acceleration * self.comfortable_braking_deceleration)),
+            / self.dynamic_gap_denominator,
             0,
         )
 
@@ -115,7 +121,54 @@ class IDMBehavior(Behavior):
             - (s_star / net_distance) ** 2
         )
 
-    def considers_lane_safe(self, vehicle: Vehicle, lane: Lane, delta_t: float) -> bool:
-        """Check if the lane is safe to change to using the n seconds rule."""
+    @staticmethod
+    def calculate_accelerations(
+        positions: npt.NDArray[np.float64],
+        velocities: npt.NDArray[np.float64],
+        leader_positions: npt.NDArray[np.float64],
+        leader_velocities: npt.NDArray[np.float64],
+        parameters: Mapping[str, npt.NDArray[np.float64]],
+    ) -> npt.NDArray[np.float64]:
+        """Calculate the IDM acceleration of many vehicles at once.
+        The parameters map every name in batch_parameters to an array with a value per vehicle,
+        e.g. the parameter table of the vectorized engine.
+        A vehicle without a leading vehicle should get an infinite leader position."""
+
+        # Calculate the desired dynamic part of the minimum gap
+        s_star = velocities * parameters["time_headway"]
+        s_star += (
+            velocities * (velocities - leader_velocities) / parameters["dynamic_gap_denominator"]
+        )
+        np.maximum(s_star, 0, out=s_star)
+        s_star += parameters["minimum_spacing"]
+
+        # With a leader at infinity the interaction term vanishes (s_star / -inf = 0)
+        with np.errstate(divide="ignore"):
+            interaction = s_star / (positions - leader_positions)  # - leader_lengths
+
+        # IDM acceleration equation
+        free_road = (velocities / parameters["desired_velocity"]) ** parameters[
+            "acceleration_exponent"
+        ]
+        return parameters["max_acceleration"] * (1 - free_road - interaction * interaction)
+
+    @classmethod
+    def calculate_lane_velocities(
+        cls,
+        lane: ArrayLane,
+        changed_lane: npt.NDArray[np.bool_],
+        delta_t: float,
+        rng: np.random.Generator,
+    ) -> npt.NDArray[np.float64]:
+        """Return the new velocities of all vehicles in a lane of the vectorized engine."""
+
+        leader_positions, leader_velocities, _ = lane.leaders()
+        accelerations = cls.calculate_accelerations(
+            positions=lane.positions,
+            velocities=lane.velocities,
+            leader_positions=leader_positions,
+            leader_velocities=leader_velocities,
+            parameters=lane.parameters,
+        )
 
-        return is_outside_n_seconds_rule(vehicle, lane, self.time_headway)
+        return np.maximum(0, lane.velocities + accelerations * delta_t)
@@ -10,53 +10,37 @@ if TYPE_CHECKING:
     from Vehicles.Vehicle import Vehicle
 
 
-def overtake_if_possible(road: Road, vehicle: Vehicle, delta_t: float) -> bool:
-    """Go to a higher lane if it is safe to do so, and return whether the vehicle changed lanes."""
+def get_overtake_lane(road: Road, vehicle: Vehicle, safe_time: float) -> int | None:
+    """Return the higher lane if it is safe to go to with the given n seconds rule time,
+    else None. The road is not changed."""
     current_lane_index = road.get_current_lane_index(vehicle=vehicle)
 
     # If there is no next lane, we cannot overtake
     if current_lane_index + 1 >= road.num_lanes():
-        return False
+        return None
 
     next_lane = road.lanes[current_lane_index + 1]
 
     # If the next lane is safe, we can overtake
-    if vehicle.behavior_model.considers_lane_safe(
-        vehicle=vehicle,
-        lane=next_lane,
-        delta_t=delta_t,
-    ):
-        road.change_vehicle_lane(
-            vehicle=vehicle,
-            new_lane_index=current_lane_index + 1,
-            current_lane_index=current_lane_index,
-        )
-        return True
-    return False
-
-
-def return_if_possible(road: Road, vehicle: Vehicle, delta_t: float) -> bool:
-    """Go to a lower lane if it is safe to do so."""
+    if is_outside_n_seconds_rule(vehicle, next_lane, safe_time):
+        return current_lane_index + 1
+    return None
+
+
+def get_return_lane(road: Road, vehicle: Vehicle, safe_time: float) -> int | None:
+    """Return the lower lane if it is safe to go to with the given n seconds rule time,
+    else None. The road is not changed."""
     current_lane_index = road.get_current_lane_index(vehicle)
 
     # If the vehicle is in the first lane, it cannot return
     if current_lane_index == 0:
-        return False
+        return None
 
     previous_lane = road.lanes[current_lane_index - 1]
 
-    if vehicle.behavior_model.considers_lane_safe(
-        vehicle=vehicle,
-        lane=previous_lane,
-        delta_t=delta_t,
-    ):
-        road.change_vehicle_lane(
-            vehicle=vehicle,
-            new_lane_index=current_lane_index - 1,
-            current_lane_index=current_lane_index,
-        )
-        return True
-    return False
+    if is_outside_n_seconds_rule(vehicle, previous_lane, safe_time):
+        return current_lane_index - 1
+    return None
 
 
 def is_outside_n_seconds_rule(vehicle: Vehicle, lane: Lane, safe_seconds: float) -> bool:
@@ -2,22 +2,35 @@
 from __future__ import annotations
 
 import numpy as np
+import numpy.typing as npt
 
 from Behaviors.BehaviorBase import Behavior
-from Behaviors.LaneChanging import (
-    calculate_save_distance_n_seconds_rule,
-    is_outside_n_seconds_rule,
-    overtake_if_possible,
-    return_if_possible,
-)
-from Road.Lane import Lane
+from Behaviors.LaneChanging import calculate_save_distance_n_seconds_rule
+from Road.ArrayLane import ArrayLane
 from Road.Road import Road
 from Vehicles.Vehicle import Vehicle
 
 
+def calculate_blocked_vehicles(
+    lane: ArrayLane,
+    changed_lane: npt.NDArray[np.bool_],
+    leader_positions: npt.NDArray[np.float64],
+) -> npt.NDArray[np.bool_]:
+    """Return which vehicles in a lane of the vectorized engine did not change lanes
+    while being too close to their leading vehicle, so they could not overtake."""
+
+    return ~changed_lane & (
+        leader_positions - lane.positions < lane.velocities * lane.parameters["save_time"]
+    )
+
+
 class SimpleBehavior(Behavior):
     """Implementation of the simple behavior model."""
 
+    __slots__ = ("desired_velocity", "initial_velocity_deviation", "update_velocity_deviation")
+
+    batch_parameters = ("desired_velocity", "update_velocity_deviation")
+
     @staticmethod
     def standard_parameters() -> list[tuple[str, str, float, str]]:
         """Return the standard parameters for the Gipps behavior model."""
@@ -31,25 +44,48 @@ class SimpleBehavior(Behavior):
         desired_velocity: float,  # m/s
         initial_velocity_deviation: float = (4 / 3.6),  # m/s
         update_velocity_deviation: float = (1 / 3.6),  # m/s
+        *,
+        rng: np.random.Generator,
     ) -> None:
+        self.rng = rng
         self.desired_velocity = desired_velocity  # m/s
         self.initial_velocity_deviation = initial_velocity_deviation  # m/s
         self.update_velocity_deviation = update_velocity_deviation  # m/s
 
     def set_initial_velocity(self, vehicle: Vehicle) -> None:
         # Take the desired velocity and add a random deviation
-        vehicle.velocity = np.random.normal(self.desired_velocity, self.initial_velocity_deviation)
+        vehicle.velocity = self.rng.normal(self.desired_velocity, self.initial_velocity_deviation)
 
-    def update(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
+    def next_velocity(
+        self, vehicle: Vehicle, road: Road, delta_t: float, changed_lane: bool
+    ) -> float:
         # Take the current velocity and add a random deviation
-        vehicle.velocity = max(
-            0, np.random.normal(vehicle.velocity, self.update_velocity_deviation)
+        return max(0, self.rng.normal(vehicle.velocity, self.update_velocity_deviation))
+
+    @classmethod
+    def calculate_lane_velocities(
+        cls,
+        lane: ArrayLane,
+        changed_lane: npt.NDArray[np.bool_],
+        delta_t: float,
+        rng: np.random.Generator,
+    ) -> npt.NDArray[np.float64]:
+        """Return the new velocities of all vehicles in a lane of the vectorized engine."""
+
+        # Take the current velocities and add a random deviation, drawn for the whole lane at once
+        return np.maximum(
+            0, rng.normal(lane.velocities, lane.parameters["update_velocity_deviation"])
         )
 
 
 class SimpleFollowingBehavior(SimpleBehavior):
     """Implementation of the simple behavior model."""
 
+    __slots__ = ("save_time",)
+
+    batch_parameters = SimpleBehavior.batch_parameters + ("save_time",)
+    safe_time_parameter = "save_time"
+
     @staticmethod
     def standard_parameters() -> list[tuple[str, str, float, str]]:
         """Return the standard parameters for the Gipps behavior model."""
@@ -65,44 +101,60 @@ class SimpleFollowingBehavior(SimpleBehavior):
         initial_velocity_deviation: float = (4 / 3.6),
         update_velocity_deviation: float = (1 / 3.6),
         save_time: float = 2,  # s
+        *,
+        rng: np.random.Generator,
     ) -> None:
-        super().__init__(desired_velocity, initial_velocity_deviation, update_velocity_deviation)
+        super().__init__(
+            desired_velocity, initial_velocity_deviation, update_velocity_deviation, rng=rng
+        )
         self.save_time = save_time
 
-    def update(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
-        """Update the vehicle's state and position."""
-
-        # First check if the vehicle can return to its original lane
-        if return_if_possible(road, vehicle, delta_t):
-            super().update(vehicle, road, delta_t)
-            return
-
-        # Now check if the vehicle is too close to the leading vehicle
-        current_lane_index = road.get_current_lane_index(vehicle)
-        lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
-        if lead_vehicle:
-            save_distance = calculate_save_distance_n_seconds_rule(vehicle, self.save_time)
-            if lead_vehicle.position - vehicle.position < save_distance:
-                # If the vehicle is too close, check if it can overtake
-                if overtake_if_possible(road, vehicle, delta_t):
-                    super().update(vehicle, road, delta_t)
-                    return
-                else:
+    def next_velocity(
+        self, vehicle: Vehicle, road: Road, delta_t: float, changed_lane: bool
+    ) -> float:
+        """Return the vehicle's new velocity."""
+
+        if not changed_lane:
+            # Check if the vehicle is too close to the leading vehicle, so it could not overtake
+            current_lane_index = road.get_current_lane_index(vehicle)
+            lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
+            if lead_vehicle:
+                save_distance = calculate_save_distance_n_seconds_rule(vehicle, self.save_time)
+                if lead_vehicle.position - vehicle.position < save_distance:
                     # If the vehicle cannot overtake, reduce the velocity
-                    vehicle.velocity = lead_vehicle.velocity
-                    return
+                    return lead_vehicle.velocity
+
+        return super().next_velocity(vehicle, road, delta_t, changed_lane)
 
-        super().update(vehicle, road, delta_t)
+    @classmethod
+    def calculate_lane_velocities(
+        cls,
+        lane: ArrayLane,
+        changed_lane: npt.NDArray[np.bool_],
+        delta_t: float,
+        rng: np.random.Generator,
+    ) -> npt.NDArray[np.float64]:
+        """Return the new velocities of all vehicles in a lane of the vectorized engine."""
 
-    def considers_lane_safe(self, vehicle: Vehicle, lane: Lane, delta_t: float) -> bool:
-        """Check if the lane is safe to change to using the n seconds rule."""
+        leader_positions, leader_velocities, _ = lane.leaders()
+        velocities = super().calculate_lane_velocities(lane, changed_lane, delta_t, rng)
 
-        return is_outside_n_seconds_rule(vehicle, lane, self.save_time)
+        # Vehicles that are too close and cannot overtake take the velocity of their leader
+        blocked = calculate_blocked_vehicles(lane, changed_lane, leader_positions)
+        velocities[blocked] = leader_velocities[blocked]
+
+        return velocities
 
 
 class SimpleFollowingExtendedBehavior(SimpleBehavior):
     """Implementation of an extension of the simple behavior model."""
 
+    __slots__ = ("save_time",)
+
+    batch_parameters = SimpleBehavior.batch_parameters + ("save_time",)
+    safe_time_parameter = "save_time"
+    return_safe_time_factor = 1.5
+
     @staticmethod
     def standard_parameters() -> list[tuple[str, str, float, str]]:
         """Return the standard parameters for the Gipps behavior model."""
@@ -118,8 +170,12 @@ class SimpleFollowingExtendedBehavior(SimpleBehavior):
         initial_velocity_deviation: float = (4 / 3.6),
         update_velocity_deviation: float = (1 / 3.6),
         save_time: float = 2,  # s
+        *,
+        rng: np.random.Generator,
     ) -> None:
-        super().__init__(desired_velocity, initial_velocity_deviation, update_velocity_deviation)
+        super().__init__(
+            desired_velocity, initial_velocity_deviation, update_velocity_deviation, rng=rng
+        )
         self.save_time = save_time
 
     def calculate_velocity(self, vehicle: Vehicle) -> float:
@@ -128,43 +184,53 @@ class SimpleFollowingExtendedBehavior(SimpleBehavior):
 
         velocity = max(
             0,
-            0.99 * np.random.normal(vehicle.velocity, self.update_velocity_deviation)
+            0.99 * self.rng.normal(vehicle.velocity, self.update_velocity_deviation)
             + 0.01 * self.desired_velocity,
         )
 
         return velocity
 
-    def update(self, vehicle: Vehicle, road: Road, delta_t: float) -> None:
-        """Update the vehicle's state and position."""
-
-        # First check if the vehicle can return to its original lane
-        # Use for this a 50% longer save time
-        self.save_time *= 1.5
-        if return_if_possible(road, vehicle, delta_t):
-            vehicle.velocity = self.calculate_velocity(vehicle)
-            self.save_time /= 1.5
-            return
-        self.save_time /= 1.5
-
-        # Now check if the vehicle is too close to the leading vehicle
-        current_lane_index = road.get_current_lane_index(vehicle)
-        lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
-        if lead_vehicle:
-            save_distance = calculate_save_distance_n_seconds_rule(vehicle, self.save_time)
-            if lead_vehicle.position - vehicle.position < save_distance:
-                # If the vehicle is too close, check if it can overtake
-                if overtake_if_possible(road, vehicle, delta_t):
-                    vehicle.velocity = self.calculate_velocity(vehicle)
-                    return
-                else:
+    def next_velocity(
+        self, vehicle: Vehicle, road: Road, delta_t: float, changed_lane: bool
+    ) -> float:
+        """Return the vehicle's new velocity."""
+
+        if not changed_lane:
+            # Check if the vehicle is too close to the leading vehicle, so it could not overtake
+            current_lane_index = road.get_current_lane_index(vehicle)
+            lead_vehicle = road.lanes[current_lane_index].get_leading_vehicle(vehicle)
+            if lead_vehicle:
+                save_distance = calculate_save_distance_n_seconds_rule(vehicle, self.save_time)
+                if lead_vehicle.position - vehicle.position < save_distance:
                     # If the vehicle cannot overtake, reduce the velocity with 10% per second
                     # So after 1 second 0.9, after 2 seconds 0.9**2, etc.
-                    vehicle.velocity = min(vehicle.velocity * 0.9**delta_t, lead_vehicle.velocity)
-                    return
+                    return min(vehicle.velocity * 0.9**delta_t, lead_vehicle.velocity)
+
+        return self.calculate_velocity(vehicle)
 
-        vehicle.velocity = self.calculate_velocity(vehicle)
+    @classmethod
+    def calculate_lane_velocities(
+        cls,
+        lane: ArrayLane,
+        changed_lane: npt.NDArray[np.bool_],
+        delta_t: float,
+        rng: np.random.Generator,
+    ) -> npt.NDArray[np.float64]:
+        """Return the new velocities of all vehicles in a lane of the vectorized engine."""
 
-    def considers_lane_safe(self, vehicle: Vehicle, lane: Lane, delta_t: float) -> bool:
-        """Check if the lane is safe to change to using the n seconds rule."""
+        leader_positions, leader_velocities, _ = lane.leaders()
+
+        # Weighted average of the desired velocity and the current velocity with a deviation
+        velocities = 0.99 * rng.normal(
+            lane.velocities, lane.parameters["update_velocity_deviation"]
+        )
+        velocities += 0.01 * lane.parameters["desired_velocity"]
+        np.maximum(velocities, 0, out=velocities)
+
+        # Vehicles that are too close and cannot overtake reduce their velocity with 10% per second
+        blocked = calculate_blocked_vehicles(lane, changed_lane, leader_positions)
+        velocities[blocked] = np.minimum(
+            lane.velocities[blocked] * 0.9**delta_t, leader_velocities[blocked]
+        )
 
-        return is_outside_n_seconds_rule(vehicle, lane, self.save_time)
+        return velocities
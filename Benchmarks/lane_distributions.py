@@ -0,0 +1,69 @@
+"""
+Microbenchmark for assigning new cars to lanes with the lane distributions.
+A call should cost O(lanes), independent of the number of new cars, and a batch of steps
+should cost a constant time per car.
+"""
+import time
+
+import numpy as np
+
+# pylint: disable=wrong-import-position
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.append(os.getcwd())
+# pylint: enable=wrong-import-position
+
+from Spawning.LaneDistributions import lane_distribution_factory, lane_samplings
+
+
+def time_calls(sampling: str, lanes: int, new_cars: int, calls: int = 20000) -> float:
+    """Return the average wall time of a call for the given number of new cars in seconds."""
+
+    lane_distribution = lane_distribution_factory(
+        lanes, "triangle", sampling=sampling, rng=np.random.default_rng(0)
+    )
+    # The first call fills the table of the deterministic sampling
+    lane_distribution(new_cars)
+
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        lane_distribution(new_cars)
+    return (time.perf_counter_ns() - start) / 1e9 / calls
+
+
+def time_batch(sampling: str, lanes: int, steps: int = 10**4, rate: float = 1.0) -> float:
+    """Return the average wall time per car of assigning the lanes of a batch of steps
+    in seconds, with a Poisson number of new cars per step."""
+
+    lane_distribution = lane_distribution_factory(
+        lanes, "triangle", sampling=sampling, rng=np.random.default_rng(0)
+    )
+    new_cars = np.random.default_rng(1).poisson(rate, size=steps)
+    new_cars = new_cars[new_cars > 0]
+
+    start = time.perf_counter_ns()
+    lane_distribution.assign_lanes(new_cars)
+    return (time.perf_counter_ns() - start) / 1e9 / new_cars.sum()
+
+
+def run_benchmark(lane_counts: list[int], new_car_counts: list[int]) -> None:
+    """Print the time per call and per car in a batch for both samplings."""
+
+    print(f"{'sampling':>14} {'lanes':>6} {'new cars':>9} {'per call (us)':>14}")
+    for sampling in lane_samplings:
+        for lanes in lane_counts:
+            for new_cars in new_car_counts:
+                duration = time_calls(sampling, lanes, new_cars)
+                print(f"{sampling:>14} {lanes:>6} {new_cars:>9} {duration * 1e6:>14.2f}")
+
+    print()
+    print(f"{'sampling':>14} {'lanes':>6} {'per car in a batch (us)':>24}")
+    for sampling in lane_samplings:
+        for lanes in lane_counts:
+            print(f"{sampling:>14} {lanes:>6} {time_batch(sampling, lanes) * 1e6:>24.3f}")
+
+
+if __name__ == "__main__":
+    run_benchmark([3, 10], [1, 10, 100, 1000])
@@ -0,0 +1,39 @@
+"""
+Microbenchmark for removing the vehicles that leave the road at the front of a lane.
+With constant time removal the time per removed vehicle should stay roughly constant.
+"""
+import time
+
+# pylint: disable=wrong-import-position
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.append(os.getcwd())
+# pylint: enable=wrong-import-position
+
+from Benchmarks.lane_lookups import create_road
+
+
+def time_drain(vehicle_count: int) -> float:
+    """Return the average wall time in seconds of removing the first vehicle of a lane
+    until the lane is empty."""
+
+    road = create_road(vehicles_per_lane=vehicle_count, lanes=1)
+
+    start = time.perf_counter_ns()
+    while len(road.lanes[0].vehicles) > 0:
+        road.delete_first_vehicle(0)
+    return (time.perf_counter_ns() - start) / 1e9 / vehicle_count
+
+
+def run_benchmark(vehicle_counts: list[int]) -> None:
+    """Print the time per removed vehicle for the given vehicle counts."""
+
+    print(f"{'vehicles':>10} {'per vehicle (us)':>18}")
+    for vehicle_count in vehicle_counts:
+        print(f"{vehicle_count:>10} {time_drain(vehicle_count) * 1e6:>18.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark([1000, 10000, 100000])
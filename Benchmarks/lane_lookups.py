@@ -0,0 +1,78 @@
+"""
+Microbenchmark for the step time of the object engine as a function of the number of vehicles.
+With constant time leader lookups the time per vehicle should stay roughly constant.
+"""
+import time
+
+import numpy as np
+
+# pylint: disable=wrong-import-position
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.append(os.getcwd())
+# pylint: enable=wrong-import-position
+
+from Behaviors.IDM import IDMBehavior
+from Road.Lane import Lane
+from Road.Road import Road
+from Vehicles.Vehicle import Vehicle
+
+
+def create_road(
+    vehicles_per_lane: int, rng: np.random.Generator, lanes: int = 3, spacing: float = 50
+) -> Road:
+    """Create a road with evenly spaced IDM vehicles in every lane,
+    with the random numbers of their behaviors from the generator."""
+
+    road = Road(length=vehicles_per_lane * spacing * 10)
+    for _ in range(lanes):
+        road.add_lane(lane=Lane())
+
+    for lane_index in range(lanes):
+        # Add the vehicles from the front to the back, so every vehicle is added at the end
+        for index in reversed(range(vehicles_per_lane)):
+            vehicle = Vehicle(
+                position=index * spacing + lane_index * spacing / lanes,
+                behavior_model=IDMBehavior(
+                    desired_velocity=27.78,
+                    time_headway=1.5,
+                    max_acceleration=2,
+                    comfortable_braking_deceleration=3,
+                    minimum_spacing=2,
+                    acceleration_exponent=4,
+                    rng=rng,
+                ),
+            )
+            road.add_vehicle(vehicle=vehicle, lane_index=lane_index)
+
+    return road
+
+
+def time_steps(road: Road, steps: int, time_step: float = 0.1) -> float:
+    """Return the average wall time of a simulation step in seconds."""
+
+    start = time.perf_counter_ns()
+    for _ in range(steps):
+        for lane in road.lanes.values():
+            for vehicle in lane.vehicles:
+                vehicle.update(road=road, delta_t=time_step)
+    return (time.perf_counter_ns() - start) / 1e9 / steps
+
+
+def run_benchmark(vehicle_counts: list[int], steps: int = 20) -> None:
+    """Print the step time and the step time per vehicle for the given vehicle counts."""
+
+    rng = np.random.default_rng(0)
+    print(f"{'vehicles':>10} {'step (ms)':>12} {'per vehicle (us)':>18}")
+    for vehicle_count in vehicle_counts:
+        road = create_road(vehicles_per_lane=vehicle_count // 3, rng=rng)
+        step_time = time_steps(road, steps)
+        print(
+            f"{vehicle_count:>10} {step_time * 1e3:>12.2f} {step_time / vehicle_count * 1e6:>18.2f}"
+        )
+
+
+if __name__ == "__main__":
+    run_benchmark([300, 1000, 3000, 10000, 30000])
@@ -0,0 +1,73 @@
+"""
+Microbenchmark for spawning vehicles at different rates.
+The arrivals are scheduled in advance, so a step without arrivals should cost almost nothing
+and the time per step should grow with the number of spawned vehicles only.
+"""
+import time
+from typing import Any
+
+import numpy as np
+
+# pylint: disable=wrong-import-position
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.append(os.getcwd())
+# pylint: enable=wrong-import-position
+
+from Spawning.Spawners import VehicleSpawner
+
+
+class DiscardingRoad:
+    """Road that discards the added vehicles, so only the spawning is timed."""
+
+    def add_vehicle(self, vehicle: Any, lane_index: int) -> None:
+        """Discard the vehicle."""
+
+
+class DiscardingDataCollector:
+    """Data collector that discards the spawn times."""
+
+    def vehicle_added(self, vehicle: Any, simulation_time: float) -> None:
+        """Discard the spawn time."""
+
+
+def sample_parameters(count: int) -> dict[str, np.ndarray]:
+    """Sample a desired velocity for every vehicle."""
+
+    return {"desired_velocity": np.full(count, 27.78)}
+
+
+def time_spawning(cars_per_second: float, steps: int, time_step: float = 0.1) -> float:
+    """Return the average wall time of spawning in a step in seconds."""
+
+    spawner = VehicleSpawner(
+        spawn_process="poisson",
+        lane_distribution_type="triangle",
+        vehicle_factory=dict,
+        total_lanes=3,
+        road=DiscardingRoad(),  # type: ignore
+        data_collector=DiscardingDataCollector(),  # type: ignore
+        cars_per_second=cars_per_second,
+        time_step=time_step,
+        rng=np.random.default_rng(0),
+        parameter_sampler=sample_parameters,
+    )
+
+    start = time.perf_counter_ns()
+    for step in range(steps):
+        spawner.spawn(step * time_step)
+    return (time.perf_counter_ns() - start) / 1e9 / steps
+
+
+def run_benchmark(rates: list[float], steps: int = 360000) -> None:
+    """Print the time per step for the given rates in cars per second."""
+
+    print(f"{'cars/s':>10} {'per step (us)':>15}")
+    for cars_per_second in rates:
+        print(f"{cars_per_second:>10} {time_spawning(cars_per_second, steps) * 1e6:>15.3f}")
+
+
+if __name__ == "__main__":
+    run_benchmark([0.01, 0.1, 1.0, 10.0])
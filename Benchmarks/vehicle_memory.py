@@ -0,0 +1,112 @@
+"""
+Microbenchmark for the memory used by a vehicle with its behavior model,
+and the step time of the object engine, for every behavior model.
+"""
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+# pylint: disable=wrong-import-position
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.append(os.getcwd())
+# pylint: enable=wrong-import-position
+
+from Behaviors.BehaviorBase import Behavior
+from Behaviors.Gipps import GippsBehavior
+from Behaviors.IDM import IDMBehavior
+from Behaviors.SimpleBehavior import SimpleFollowingBehavior
+from Road.Lane import Lane
+from Road.Road import Road
+from Vehicles.Vehicle import Vehicle
+
+# Factories of the behavior models, with the generator of their random numbers
+behavior_factories: dict[str, Callable[[np.random.Generator], Behavior]] = {
+    "IDM": lambda rng: IDMBehavior(
+        desired_velocity=27.78,
+        time_headway=1.5,
+        max_acceleration=2,
+        comfortable_braking_deceleration=3,
+        minimum_spacing=2,
+        acceleration_exponent=4,
+        rng=rng,
+    ),
+    "Gipps": lambda rng: GippsBehavior(
+        maximum_acceleration=2,
+        maximum_deceleration=4,
+        desired_velocity=27.78,
+        apparent_reaction_time=2,
+        comfortable_distance=2,
+        rng=rng,
+    ),
+    "Simple Following": lambda rng: SimpleFollowingBehavior(desired_velocity=27.78, rng=rng),
+}
+
+
+def measure_memory(
+    behavior_factory: Callable[[np.random.Generator], Behavior],
+    vehicle_count: int,
+    rng: np.random.Generator,
+) -> float:
+    """Return the memory allocated per vehicle with its behavior model in bytes."""
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    vehicles = [
+        Vehicle(position=index, behavior_model=behavior_factory(rng))
+        for index in range(vehicle_count)
+    ]
+    end = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # The list itself holds a pointer per vehicle
+    return (end - start) / len(vehicles)
+
+
+def measure_step_time(
+    behavior_factory: Callable[[np.random.Generator], Behavior],
+    vehicles_per_lane: int,
+    steps: int,
+    rng: np.random.Generator,
+    lanes: int = 3,
+    spacing: float = 50,
+    time_step: float = 0.1,
+) -> float:
+    """Return the average wall time of a simulation step per vehicle in seconds."""
+
+    road = Road(length=vehicles_per_lane * spacing * 10)
+    for _ in range(lanes):
+        road.add_lane(lane=Lane())
+    for lane_index in range(lanes):
+        for index in reversed(range(vehicles_per_lane)):
+            vehicle = Vehicle(
+                position=index * spacing + lane_index * spacing / lanes,
+                behavior_model=behavior_factory(rng),
+            )
+            road.add_vehicle(vehicle=vehicle, lane_index=lane_index)
+
+    start = time.perf_counter_ns()
+    for _ in range(steps):
+        for lane in road.lanes.values():
+            for vehicle in lane.vehicles:
+                vehicle.update(road=road, delta_t=time_step)
+    return (time.perf_counter_ns() - start) / 1e9 / steps / (vehicles_per_lane * lanes)
+
+
+def run_benchmark(vehicle_count: int = 30000, steps: int = 20) -> None:
+    """Print the memory per vehicle and the step time per vehicle for every behavior model."""
+
+    rng = np.random.default_rng(0)
+    print(f"{'behavior':>18} {'bytes per vehicle':>18} {'step per vehicle (us)':>22}")
+    for name, behavior_factory in behavior_factories.items():
+        memory = measure_memory(behavior_factory, vehicle_count, rng)
+        step_time = measure_step_time(behavior_factory, vehicle_count // 30, steps, rng)
+        print(f"{name:>18} {memory:>18.0f} {step_time * 1e6:>22.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,162 @@
+"""Implements the ArrayLane class, a structure-of-arrays variant of the Lane class"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+if TYPE_CHECKING:
+    from Behaviors.Behaviors import BehaviorType
+    from Vehicles.Vehicle import Vehicle
+
+
+class VehicleStates(NamedTuple):
+    """The state of a group of vehicles of an ArrayLane, with an entry per vehicle"""
+
+    vehicles: npt.NDArray[np.object_]
+    ids: npt.NDArray[np.int64]
+    positions: npt.NDArray[np.float64]
+    velocities: npt.NDArray[np.float64]
+    previous_positions: npt.NDArray[np.float64]
+    previous_velocities: npt.NDArray[np.float64]
+    parameters: npt.NDArray[Any]
+
+
+class ArrayLane:
+    """A lane on a road that stores the state of its vehicles in NumPy arrays.
+    Like in Lane, index 0 is the first vehicle in the lane and the arrays are sorted
+    in descending order of position."""
+
+    def __init__(self, behavior: BehaviorType) -> None:
+        self.behavior = behavior
+
+        # The vehicle objects are only used for bookkeeping (ids and data collection),
+        # the state that is updated every step lives in the arrays below
+        self.vehicles: npt.NDArray[np.object_] = np.empty(0, dtype=object)
+        self.ids: npt.NDArray[np.int64] = np.empty(0, dtype=np.int64)
+        self.positions: npt.NDArray[np.float64] = np.empty(0)
+        self.velocities: npt.NDArray[np.float64] = np.empty(0)
+        self.previous_positions: npt.NDArray[np.float64] = np.empty(0)
+        self.previous_velocities: npt.NDArray[np.float64] = np.empty(0)
+        self.parameters: npt.NDArray[Any] = np.empty(0, dtype=behavior.batch_parameter_dtype())
+
+    def __len__(self) -> int:
+        return len(self.vehicles)
+
+    def add_vehicle(self, vehicle: Vehicle) -> None:
+        """Add a vehicle object to the lane at the right position"""
+
+        vehicles = np.empty(1, dtype=object)
+        vehicles[0] = vehicle
+        self.insert_states(
+            VehicleStates(
+                vehicles=vehicles,
+                ids=np.array([vehicle.id], dtype=np.int64),
+                positions=np.array([vehicle.position], dtype=np.float64),
+                velocities=np.array([vehicle.velocity], dtype=np.float64),
+                previous_positions=np.array([vehicle.previous_position], dtype=np.float64),
+                previous_velocities=np.array([vehicle.previous_velocity], dtype=np.float64),
+                parameters=np.array(
+                    [self.behavior.batch_parameter_values(vehicle)], dtype=self.parameters.dtype
+                ),
+            )
+        )
+
+    def get_states(self, selection: npt.NDArray[np.bool_]) -> VehicleStates:
+        """Return the state of the selected vehicles"""
+
+        return VehicleStates(
+            vehicles=self.vehicles[selection],
+            ids=self.ids[selection],
+            positions=self.positions[selection],
+            velocities=self.velocities[selection],
+            previous_positions=self.previous_positions[selection],
+            previous_velocities=self.previous_velocities[selection],
+            parameters=self.parameters[selection],
+        )
+
+    def delete_states(self, selection: npt.NDArray[np.bool_]) -> None:
+        """Remove the selected vehicles from the lane"""
+
+        self.vehicles = self.vehicles[~selection]
+        self.ids = self.ids[~selection]
+        self.positions = self.positions[~selection]
+        self.velocities = self.velocities[~selection]
+        self.previous_positions = self.previous_positions[~selection]
+        self.previous_velocities = self.previous_velocities[~selection]
+        self.parameters = self.parameters[~selection]
+
+    def insert_states(self, states: VehicleStates) -> None:
+        """Insert the state of a group of vehicles in the lane at the right positions"""
+
+        # Sort the new vehicles and insert each behind all vehicles that are at or
+        # in front of its position, like bisect.insort
+        order = np.argsort(-states.positions, kind="stable")
+        indices = np.searchsorted(-self.positions, -states.positions[order], side="right")
+
+        self.vehicles = np.insert(self.vehicles, indices, states.vehicles[order])
+        self.ids = np.insert(self.ids, indices, states.ids[order])
+        self.positions = np.insert(self.positions, indices, states.positions[order])
+        self.velocities = np.insert(self.velocities, indices, states.velocities[order])
+        self.previous_positions = np.insert(
+            self.previous_positions, indices, states.previous_positions[order]
+        )
+        self.previous_velocities = np.insert(
+            self.previous_velocities, indices, states.previous_velocities[order]
+        )
+        self.parameters = np.insert(self.parameters, indices, states.parameters[order])
+
+    def delete_first_vehicles(self, count: int) -> list[Vehicle]:
+        """Delete the first count vehicles from the lane and return them
+        with their position and velocity written back to the vehicle objects"""
+
+        if count == 0:
+            return []
+
+        for index in range(count):
+            self.sync_vehicle(index)
+        deleted = list(self.vehicles[:count])
+
+        self.vehicles = self.vehicles[count:]
+        self.ids = self.ids[count:]
+        self.positions = self.positions[count:]
+        self.velocities = self.velocities[count:]
+        self.previous_positions = self.previous_positions[count:]
+        self.previous_velocities = self.previous_velocities[count:]
+        self.parameters = self.parameters[count:]
+
+        return deleted
+
+    def sync_vehicle(self, index: int) -> None:
+        """Write the state in the arrays back to the vehicle object at the given index"""
+
+        vehicle = self.vehicles[index]
+        vehicle.position = float(self.positions[index])
+        vehicle.velocity = float(self.velocities[index])
+        vehicle.previous_position = float(self.previous_positions[index])
+        vehicle.previous_velocity = float(self.previous_velocities[index])
+
+    def leaders(
+        self,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Return the positions, velocities and lengths of the leading vehicle of every vehicle.
+        The first vehicle gets an infinite position and zero velocity and length."""
+
+        leader_positions = np.empty_like(self.positions)
+        leader_velocities = np.empty_like(self.velocities)
+        leader_lengths = np.empty_like(self.positions)
+        if len(self.positions) == 0:
+            return leader_positions, leader_velocities, leader_lengths
+
+        leader_positions[0] = np.inf
+        leader_positions[1:] = self.positions[:-1]
+        leader_velocities[0] = 0
+        leader_velocities[1:] = self.velocities[:-1]
+        leader_lengths[0] = 0
+        leader_lengths[1:] = self.parameters["length"][:-1]
+
+        return leader_positions, leader_velocities, leader_lengths
+
+    def __str__(self) -> str:
+        return f"ArrayLane: {self.vehicles}"
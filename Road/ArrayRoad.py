@@ -0,0 +1,164 @@
+"""Implementation of the ArrayRoad class, the road of the vectorized simulation engine."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import numpy.typing as npt
+
+from Road.ArrayLane import ArrayLane, VehicleStates
+from Road.LaneChangeDecisions import LaneChangeState, decide_lane_changes
+
+if TYPE_CHECKING:
+    from Analysis.DataCollector import DataCollector
+    from Behaviors.Behaviors import BehaviorType
+    from Vehicles.Vehicle import Vehicle
+
+
+class ArrayRoad:
+    """A road with multiple lanes that advances all vehicles of a lane in one batched step.
+    All vehicles on the road share the same behavior model."""
+
+    def __init__(
+        self,
+        length: float,
+        behavior: BehaviorType,
+        rng: np.random.Generator | None = None,
+        data_collector: DataCollector | None = None,
+    ) -> None:
+        if not behavior.batch_parameters:
+            raise ValueError(f"The vectorized engine does not support {behavior.__name__}")
+
+        self.lanes: dict[int, ArrayLane] = {}
+        self.vehicleslanes: dict[int, int] = {}
+        self.length: float = length
+        self.behavior: BehaviorType = behavior
+        # Random number generator of the simulation, used by stochastic behaviors
+        self.rng: np.random.Generator = rng if rng is not None else np.random.default_rng()
+        # Data collector that records the lane changes
+        self.data_collector: DataCollector | None = data_collector
+
+    def num_lanes(self) -> int:
+        """Return the number of lanes"""
+
+        return len(self.lanes)
+
+    def add_lane(self, lane: ArrayLane, index: int | None = None) -> None:
+        """Add a lane to the road at the given index"""
+
+        if index is None:
+            index = len(self.lanes)
+
+        if index in self.lanes:
+            raise ValueError(f"Lane {index} already exists")
+
+        self.lanes[index] = lane
+
+    def add_vehicle(self, vehicle: Vehicle, lane_index: int) -> None:
+        """Add a vehicle to the road in the given lane"""
+
+        if lane_index not in self.lanes:
+            raise ValueError(f"Lane {lane_index} does not exist")
+
+        if not isinstance(vehicle.behavior_model, self.behavior):
+            raise ValueError(
+                f"Vehicle {vehicle.id} does not have the {self.behavior.__name__} behavior"
+            )
+
+        self.lanes[lane_index].add_vehicle(vehicle)
+        self.vehicleslanes[vehicle.id] = lane_index
+
+    def get_current_lane_index(self, vehicle: Vehicle) -> int:
+        """Get the current lane index of a vehicle"""
+
+        return self.vehicleslanes[vehicle.id]
+
+    def update(self, delta_t: float) -> None:
+        """Update the state and position of all vehicles on the road."""
+
+        # Move all vehicles with their current velocity
+        for lane in self.lanes.values():
+            lane.previous_positions = lane.positions.copy()
+            lane.previous_velocities = lane.velocities.copy()
+            lane.positions += lane.velocities * delta_t
+
+        changed_ids = self.change_lanes()
+
+        # Update the velocities of all vehicles in a lane at once
+        for lane in self.lanes.values():
+            lane.velocities = self.behavior.calculate_lane_velocities(
+                lane=lane,
+                changed_lane=np.isin(lane.ids, changed_ids),
+                delta_t=delta_t,
+                rng=self.rng,
+            )
+
+    def change_lanes(self) -> npt.NDArray[np.int64]:
+        """Let every vehicle return to the lane below or overtake if it is safe to do so,
+        all decided on the same state of the road and applied at once.
+        Return the ids of the vehicles that changed lanes."""
+
+        if self.behavior.safe_time_parameter is None:
+            return np.empty(0, dtype=np.int64)
+
+        lanes = [self.lanes[lane_index] for lane_index in range(self.num_lanes())]
+        targets = decide_lane_changes([self.get_lane_change_state(lane) for lane in lanes])
+
+        # Take the changing vehicles out of their lanes before adding them to their new lanes
+        # The states entering every lane, with the lane they come from
+        entering: list[list[tuple[int, VehicleStates]]] = [[] for _ in lanes]
+        for lane_index, (lane, target) in enumerate(zip(lanes, targets)):
+            changing = target >= 0
+            if not changing.any():
+                continue
+
+            for new_lane_index in (lane_index - 1, lane_index + 1):
+                selection = changing & (target == new_lane_index)
+                if selection.any():
+                    entering[new_lane_index].append((lane_index, lane.get_states(selection)))
+            lane.delete_states(changing)
+
+        changed_ids: list[npt.NDArray[np.int64]] = []
+        for new_lane_index, (lane, states) in enumerate(zip(lanes, entering)):
+            for current_lane_index, state in states:
+                lane.insert_states(state)
+                changed_ids.append(state.ids)
+                for vehicle_id in state.ids.tolist():
+                    self.vehicleslanes[vehicle_id] = new_lane_index
+
+                if self.data_collector is not None:
+                    self.data_collector.vehicles_changed_lane(
+                        current_lane_index,
+                        new_lane_index,
+                        state.ids,
+                        state.positions,
+                        state.velocities,
+                    )
+
+        return np.concatenate(changed_ids) if changed_ids else np.empty(0, dtype=np.int64)
+
+    def get_lane_change_state(self, lane: ArrayLane) -> LaneChangeState:
+        """Return the state of a lane needed to decide on lane changes"""
+
+        safe_distances = lane.velocities * lane.parameters[self.behavior.safe_time_parameter]
+        return LaneChangeState(
+            positions=lane.positions,
+            lengths=lane.parameters["length"],
+            safe_distances=safe_distances,
+            return_safe_distances=safe_distances * self.behavior.return_safe_time_factor,
+        )
+
+    def delete_exited_vehicles(self) -> list[Vehicle]:
+        """Delete the vehicles that have left the road and return them"""
+
+        deleted: list[Vehicle] = []
+        for lane in self.lanes.values():
+            # Only the vehicles at the front of the lane can have left the road
+            beyond_road = lane.positions > self.length
+            count = len(beyond_road) if beyond_road.all() else int(np.argmin(beyond_road))
+
+            for vehicle in lane.delete_first_vehicles(count):
+                del self.vehicleslanes[vehicle.id]
+                deleted.append(vehicle)
+
+        return deleted
@@ -1,9 +1,13 @@
 """Implements the Lane class"""
 from __future__ import annotations
 
-import bisect
 from typing import TYPE_CHECKING
 
+import numpy as np
+import numpy.typing as npt
+
+from Road.VehicleQueue import VehicleQueue
+
 if TYPE_CHECKING:
     from Vehicles.Vehicle import Vehicle
 
@@ -12,7 +16,7 @@ class Lane:
     """A lane on a road"""
 
     def __init__(self) -> None:
-        self.vehicles: list[Vehicle] = []
+        self.vehicles: VehicleQueue = VehicleQueue()
         # 0 is the first vehicle in the lane, 1 is the second vehicle in the lane, etc.
 
     def add_vehicle_at_beginning(self, vehicle: Vehicle) -> None:
@@ -25,23 +29,55 @@ class Lane:
         """Add a vehicle to the lane at the right position"""
 
         # Add a vehicle to the lane at the right position
-        # -v.position because the list is sorted in descending order
-        bisect.insort(self.vehicles, vehicle, key=lambda v: -v.position)
+        index = self.vehicles.bisect(vehicle.position, right=True)
+        self.vehicles.insert(index, vehicle)
 
     def delete_vehicle(self, vehicle: Vehicle) -> None:
         """Delete a vehicle from the lane"""
 
         self.vehicles.remove(vehicle)
 
+    def delete_first_vehicle(self) -> Vehicle:
+        """Delete the first vehicle from the lane and return it"""
+
+        return self.vehicles.popleft()
+
+    def get_index(self, vehicle: Vehicle) -> int:
+        """Get the index of the given vehicle in the lane"""
+
+        return self.vehicles.index(vehicle)
+
     def get_leading_vehicle(self, vehicle: Vehicle) -> Vehicle | None:
         """Get the vehicle in front of the given vehicle
         Returns None if there is no vehicle in front"""
 
         # index -1 is the leading one
-        index = self.vehicles.index(vehicle)
-        if index == 0:
-            return None
-        return self.vehicles[index - 1]
+        return self.vehicles.get_neighbour(vehicle, -1)
+
+    def get_following_vehicle(self, vehicle: Vehicle) -> Vehicle | None:
+        """Get the vehicle behind the given vehicle
+        Returns None if there is no vehicle behind"""
+
+        # index +1 is the following one
+        return self.vehicles.get_neighbour(vehicle, 1)
+
+    def update_vehicle_position(self, vehicle: Vehicle) -> None:
+        """Update the position of the given vehicle in the position array of the lane"""
+
+        self.vehicles.update_position(vehicle)
+
+    def get_positions(self) -> npt.NDArray[np.float64]:
+        """Get the positions of the vehicles in the lane, sorted in descending order"""
+
+        return self.vehicles.get_positions()
+
+    def get_closest_indices(self, positions: npt.ArrayLike) -> npt.NDArray[np.intp]:
+        """Get the index of the vehicle behind each of the given positions
+        The vehicle in front of a position has the returned index - 1
+        An index of 0 means there is no vehicle in front,
+        an index equal to the number of vehicles means there is no vehicle behind"""
+
+        return self.vehicles.bisect_many(positions)
 
     def get_closest_vehicles(self, position: float) -> tuple[Vehicle | None, Vehicle | None]:
         """Get the vehicles in front of and behind the given position
@@ -54,7 +90,7 @@ class Lane:
         if len(self.vehicles) == 0:
             return (None, None)
 
-        index = bisect.bisect_left(self.vehicles, -position, key=lambda v: -v.position)
+        index = self.vehicles.bisect(position)
         if index == len(self.vehicles):
             return (self.vehicles[index - 1], None)
         elif index == 0:
@@ -0,0 +1,129 @@
+"""Decides on the lane changes of all vehicles on a road at once with array operations.
+Implements the same rule as Behavior.lane_change_intent, read from the safe_time_parameter
+and return_safe_time_factor of the behaviors: a vehicle returns to the lane below if it keeps
+the safe distance there (n seconds rule), else it overtakes if it is too close to its leading
+vehicle and the lane above is safe. Behaviors that override lane_change_intent are not
+supported, see Behavior.has_default_lane_changes."""
+from __future__ import annotations
+
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+
+class LaneChangeState(NamedTuple):
+    """The state of the vehicles in a lane needed to decide on lane changes,
+    with an entry per vehicle in lane order (descending position).
+    A vehicle with a nan safe distance never changes lanes, as nan fails every comparison."""
+
+    positions: npt.NDArray[np.float64]
+    lengths: npt.NDArray[np.float64]
+    # Safe distance of the n seconds rule used for overtaking
+    safe_distances: npt.NDArray[np.float64]
+    # Safe distance of the n seconds rule used for returning to the lane below
+    return_safe_distances: npt.NDArray[np.float64]
+
+
+def count_vehicles_ahead(
+    lane: LaneChangeState, positions: npt.NDArray[np.float64]
+) -> npt.NDArray[np.intp]:
+    """Return for every position the number of vehicles of the lane in front of it,
+    which is the index of the gap in the lane the position falls in."""
+
+    # The positions are sorted in descending order, so search in the negated positions
+    return np.searchsorted(-lane.positions, -positions)
+
+
+def calculate_safe_vehicles(
+    vehicles: LaneChangeState,
+    safe_distances: npt.NDArray[np.float64],
+    lane: LaneChangeState,
+    gaps: npt.NDArray[np.intp],
+) -> npt.NDArray[np.bool_]:
+    """Return which vehicles keep the safe distance to the vehicles in front of and behind
+    the given gaps of another lane (n seconds rule)."""
+
+    # Pad the lane so the first gap has a leader at infinity and the last gap a follower at -infinity
+    leading_rears = np.concatenate(([np.inf], lane.positions - lane.lengths))[gaps]
+    following_positions = np.concatenate((lane.positions, [-np.inf]))[gaps]
+
+    return (leading_rears - vehicles.positions >= safe_distances) & (
+        (vehicles.positions - vehicles.lengths) - following_positions >= safe_distances
+    )
+
+
+def decide_lane_changes(lanes: Sequence[LaneChangeState]) -> list[npt.NDArray[np.intp]]:
+    """Return for every lane the lane each of its vehicles changes to, or -1 if it stays.
+    All decisions are made on the given state of the road. A gap in a lane is entered by
+    at most one vehicle, if more vehicles want to enter the same gap only the most advanced
+    one changes lanes."""
+
+    targets: list[npt.NDArray[np.intp]] = []
+    target_gaps: list[npt.NDArray[np.intp]] = []
+
+    for lane_index, lane in enumerate(lanes):
+        target = np.full(len(lane.positions), -1, dtype=np.intp)
+        gap = np.zeros(len(lane.positions), dtype=np.intp)
+
+        # First check if the vehicles can return to the lane below
+        if lane_index > 0:
+            below_gaps = count_vehicles_ahead(lanes[lane_index - 1], lane.positions)
+            can_return = calculate_safe_vehicles(
+                lane, lane.return_safe_distances, lanes[lane_index - 1], below_gaps
+            )
+            target[can_return] = lane_index - 1
+            gap[can_return] = below_gaps[can_return]
+
+        # Now check which of the other vehicles are too close to their leader and can overtake
+        if lane_index + 1 < len(lanes):
+            leader_positions = np.concatenate(([np.inf], lane.positions[:-1]))
+            too_close = (target < 0) & (leader_positions - lane.positions < lane.safe_distances)
+            above_gaps = count_vehicles_ahead(lanes[lane_index + 1], lane.positions)
+            can_overtake = too_close & calculate_safe_vehicles(
+                lane, lane.safe_distances, lanes[lane_index + 1], above_gaps
+            )
+            target[can_overtake] = lane_index + 1
+            gap[can_overtake] = above_gaps[can_overtake]
+
+        targets.append(target)
+        target_gaps.append(gap)
+
+    resolve_conflicts(lanes, targets, target_gaps)
+
+    return targets
+
+
+def resolve_conflicts(
+    lanes: Sequence[LaneChangeState],
+    targets: list[npt.NDArray[np.intp]],
+    target_gaps: list[npt.NDArray[np.intp]],
+) -> None:
+    """Cancel the lane changes of all but the most advanced vehicle entering each gap"""
+
+    # Collect all lane changes of the road
+    lane_indices = [np.flatnonzero(target >= 0) for target in targets]
+    if not any(len(indices) for indices in lane_indices):
+        return
+
+    source_lanes = np.concatenate(
+        [np.full(len(indices), index) for index, indices in enumerate(lane_indices)]
+    )
+    source_indices = np.concatenate(lane_indices)
+    target_lanes = np.concatenate([targets[i][indices] for i, indices in enumerate(lane_indices)])
+    gaps = np.concatenate([target_gaps[i][indices] for i, indices in enumerate(lane_indices)])
+    positions = np.concatenate(
+        [lanes[i].positions[indices] for i, indices in enumerate(lane_indices)]
+    )
+
+    # Sort by gap and then by descending position, the first vehicle of each gap wins
+    order = np.lexsort((-positions, gaps, target_lanes))
+    losing = np.zeros(len(order), dtype=np.bool_)
+    losing[1:] = (target_lanes[order][1:] == target_lanes[order][:-1]) & (
+        gaps[order][1:] == gaps[order][:-1]
+    )
+
+    for source_lane, source_index in zip(
+        source_lanes[order][losing], source_indices[order][losing]
+    ):
+        targets[source_lane][source_index] = -1
@@ -3,19 +3,25 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+import numpy as np
+
 from Road.Lane import Lane  # pylint: disable=W0406
+from Road.LaneChangeDecisions import LaneChangeState, decide_lane_changes
 
 if TYPE_CHECKING:
+    from Analysis.DataCollector import DataCollector
     from Vehicles.Vehicle import Vehicle
 
 
 class Road:
     """A road with multiple lanes"""
 
-    def __init__(self, length: float) -> None:
+    def __init__(self, length: float, data_collector: DataCollector | None = None) -> None:
         self.lanes: dict[int, Lane] = {}
         self.vehicleslanes: dict[int, int] = {}
         self.length: float = length
+        # Data collector that records the lane changes
+        self.data_collector: DataCollector | None = data_collector
 
     def num_lanes(self) -> int:
         """Return the number of lanes"""
@@ -51,6 +57,18 @@ class Road:
         lane.delete_vehicle(vehicle)
         del self.vehicleslanes[vehicle.id]
 
+    def delete_first_vehicle(self, lane_index: int) -> Vehicle:
+        """Delete the first vehicle in the given lane from the road and return it"""
+
+        vehicle = self.lanes[lane_index].delete_first_vehicle()
+        del self.vehicleslanes[vehicle.id]
+        return vehicle
+
+    def update_vehicle_position(self, vehicle: Vehicle) -> None:
+        """Update the position of a vehicle in its lane after it moved"""
+
+        self.lanes[self.vehicleslanes[vehicle.id]].update_vehicle_position(vehicle)
+
     def get_current_lane_index(self, vehicle: Vehicle) -> int:
         """Get the current lane index of a vehicle"""
 
@@ -87,3 +105,48 @@ class Road:
 
         # Update the vehicle lane index
         self.vehicleslanes[vehicle.id] = new_lane_index
+
+        if self.data_collector is not None:
+            self.data_collector.vehicle_changed_lane(vehicle, current_lane_index, new_lane_index)
+
+    def change_lanes(self) -> set[int]:
+        """Let every vehicle return to the lane below or overtake if it is safe to do so,
+        all decided on the same state of the road and applied at once.
+        Return the ids of the vehicles that changed lanes."""
+
+        lanes = [self.lanes[lane_index] for lane_index in range(self.num_lanes())]
+        targets = decide_lane_changes([self.get_lane_change_state(lane) for lane in lanes])
+
+        # Collect the changing vehicles before changing any lane
+        lane_changes = [
+            (lane.vehicles[index], int(target[index]))
+            for lane, target in zip(lanes, targets)
+            for index in np.flatnonzero(target >= 0).tolist()
+        ]
+        for vehicle, new_lane_index in lane_changes:
+            self.change_vehicle_lane(vehicle=vehicle, new_lane_index=new_lane_index)
+
+        return {vehicle.id for vehicle, _ in lane_changes}
+
+    def get_lane_change_state(self, lane: Lane) -> LaneChangeState:
+        """Return the state of a lane needed to decide on lane changes"""
+
+        vehicles = list(lane.vehicles)
+        velocities = np.fromiter((vehicle.velocity for vehicle in vehicles), float, len(vehicles))
+        safe_times = np.fromiter(
+            (vehicle.behavior_model.lane_change_safe_time() for vehicle in vehicles),
+            float,
+            len(vehicles),
+        )
+        return_factors = np.fromiter(
+            (vehicle.behavior_model.return_safe_time_factor for vehicle in vehicles),
+            float,
+            len(vehicles),
+        )
+
+        return LaneChangeState(
+            positions=lane.get_positions(),
+            lengths=np.fromiter((vehicle.length for vehicle in vehicles), float, len(vehicles)),
+            safe_distances=velocities * safe_times,
+            return_safe_distances=velocities * safe_times * return_factors,
+        )
@@ -0,0 +1,176 @@
+"""Implements the VehicleQueue class, the storage of the vehicles in a lane"""
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterator
+
+import numpy as np
+import numpy.typing as npt
+
+if TYPE_CHECKING:
+    from Vehicles.Vehicle import Vehicle
+
+
+class VehicleQueue:
+    """Ordered storage of the vehicles in a lane, index 0 is the first vehicle in the lane.
+    Removing the first vehicle and appending a vehicle at the end are amortized O(1),
+    inserting or removing a vehicle in between is O(n).
+    The index of a vehicle is looked up in O(1).
+    The positions of the vehicles are mirrored in a NumPy array for searching by position."""
+
+    # The removed vehicles at the front are only dropped from the list when there are
+    # at least this many of them and they take up at least half of the list
+    compact_threshold: int = 64
+
+    def __init__(self) -> None:
+        # The vehicles are stored in self.items[self.head:]
+        self.items: list[Vehicle] = []
+        self.head: int = 0
+
+        # Position of every vehicle in self.items by vehicle id
+        self.slots: dict[int, int] = {}
+
+        # -position of the vehicle in the same slot of self.items,
+        # negated so it is sorted in ascending order for np.searchsorted
+        self.negated_positions: npt.NDArray[np.float64] = np.empty(16)
+
+    def __len__(self) -> int:
+        return len(self.items) - self.head
+
+    def __getitem__(self, index: int) -> Vehicle:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("vehicle index out of range")
+        return self.items[self.head + index]
+
+    def __iter__(self) -> Iterator[Vehicle]:
+        # Iterate over the list itself, so changes during the iteration behave like they do for a list
+        return islice(self.items, self.head, None)
+
+    def index(self, vehicle: Vehicle) -> int:
+        """Return the index of the given vehicle"""
+
+        return self.slots[vehicle.id] - self.head
+
+    def get_neighbour(self, vehicle: Vehicle, offset: int) -> Vehicle | None:
+        """Return the vehicle offset places behind the given vehicle (in front of it if negative)
+        Returns None if there is no such vehicle"""
+
+        slot = self.slots[vehicle.id] + offset
+        if self.head <= slot < len(self.items):
+            return self.items[slot]
+        return None
+
+    def get_positions(self) -> npt.NDArray[np.float64]:
+        """Return the positions of the vehicles, sorted in descending order"""
+
+        return -self.negated_positions[self.head : len(self.items)]
+
+    def bisect(self, position: float, right: bool = False) -> int:
+        """Return the index where a vehicle at the given position would be inserted,
+        before (or after if right is True) the vehicles at exactly that position"""
+
+        # Scalar search on the array method directly, np.searchsorted adds a noticeable overhead
+        side = "right" if right else "left"
+        return int(
+            self.negated_positions[self.head : len(self.items)].searchsorted(-position, side)
+        )
+
+    def bisect_many(
+        self, positions: float | npt.ArrayLike, right: bool = False
+    ) -> npt.NDArray[np.intp]:
+        """Like bisect, for every position in an array of positions"""
+
+        side = "right" if right else "left"
+        return self.negated_positions[self.head : len(self.items)].searchsorted(
+            np.negative(positions), side
+        )
+
+    def update_position(self, vehicle: Vehicle) -> None:
+        """Copy the current position of the given vehicle to the position array.
+        The vehicle has to keep its place in the order of the lane."""
+
+        self.negated_positions[self.slots[vehicle.id]] = -vehicle.position
+
+    def update_slots(self, start: int) -> None:
+        """Update the slots of all vehicles from the given slot to the end of the list"""
+
+        for slot in range(start, len(self.items)):
+            self.slots[self.items[slot].id] = slot
+
+    def reserve(self) -> None:
+        """Grow the position array if it has no room for all vehicles in the list"""
+
+        if len(self.items) > len(self.negated_positions):
+            negated_positions = np.empty(2 * len(self.items))
+            negated_positions[: len(self.negated_positions)] = self.negated_positions
+            self.negated_positions = negated_positions
+
+    def append(self, vehicle: Vehicle) -> None:
+        """Add a vehicle at the end of the lane"""
+
+        self.items.append(vehicle)
+        self.reserve()
+        self.slots[vehicle.id] = len(self.items) - 1
+        self.negated_positions[len(self.items) - 1] = -vehicle.position
+
+    def insert(self, index: int, vehicle: Vehicle) -> None:
+        """Insert a vehicle before the given index"""
+
+        if index >= len(self):
+            self.append(vehicle)
+            return
+
+        slot = self.head + index
+        self.items.insert(slot, vehicle)
+        self.reserve()
+        end = len(self.items)
+        self.negated_positions[slot + 1 : end] = self.negated_positions[slot : end - 1]
+        self.negated_positions[slot] = -vehicle.position
+        self.update_slots(slot)
+
+    def remove(self, vehicle: Vehicle) -> None:
+        """Remove the given vehicle from the lane"""
+
+        slot = self.slots.pop(vehicle.id)
+        del self.items[slot]
+        end = len(self.items)
+        self.negated_positions[slot:end] = self.negated_positions[slot + 1 : end + 1]
+        self.update_slots(slot)
+
+    def popleft(self) -> Vehicle:
+        """Remove and return the first vehicle of the lane"""
+
+        if len(self) == 0:
+            raise IndexError("popleft from an empty lane")
+
+        vehicle = self.items[self.head]
+        del self.slots[vehicle.id]
+        self.head += 1
+
+        if self.head >= self.compact_threshold and 2 * self.head >= len(self.items):
+            self.compact()
+
+        return vehicle
+
+    def compact(self) -> None:
+        """Drop the removed vehicles at the front of the list"""
+
+        end = len(self.items)
+        self.negated_positions[: end - self.head] = self.negated_positions[self.head : end]
+        del self.items[: self.head]
+        self.head = 0
+        self.update_slots(0)
+
+    def sort(self, key: Callable[[Vehicle], float]) -> None:
+        """Sort the vehicles in the lane with the given key"""
+
+        del self.items[: self.head]
+        self.head = 0
+        self.items.sort(key=key)
+        self.negated_positions[: len(self.items)] = [-vehicle.position for vehicle in self.items]
+        self.update_slots(0)
+
+    def __repr__(self) -> str:
+        return repr(self.items[self.head :])
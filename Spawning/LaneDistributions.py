@@ -4,45 +4,97 @@ from __future__ import annotations
 
 from typing import Callable, Type
 
+import numpy as np
+import numpy.typing as npt
+
+# deterministic gives every lane its share of the new cars, rounded by the largest remainders,
+# multinomial draws the lane of every new car from the lane probabilities
+lane_samplings = ("deterministic", "multinomial")
+
 
 class LaneDistribution:
     """Base class for lane distributions.
     The lane distribution is used to determine how many cars should be spawned in each lane."""
 
-    def __init__(self, total_lanes: int) -> None:
+    def __init__(
+        self,
+        total_lanes: int,
+        sampling: str = "deterministic",
+        rng: np.random.Generator | None = None,
+    ) -> None:
+        if sampling not in lane_samplings:
+            raise ValueError(f"Unknown lane sampling: {sampling}")
+
         self.total_lanes = total_lanes
+        self.sampling = sampling
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.lane_probabilities: dict[int, float] = self.calculate_lane_probabilities()
 
+        # The probabilities as an array, scaled so they sum to 1, and their cumulative sums
+        probabilities = np.array([self.lane_probabilities[i] for i in range(total_lanes)])
+        self.probabilities: npt.NDArray[np.float64] = probabilities / probabilities.sum()
+        self.cumulative_probabilities: npt.NDArray[np.float64] = np.cumsum(self.probabilities)
+
+        # Number of cars per lane by number of new cars, for the deterministic sampling.
+        # Rows are added when a larger number of new cars is asked for.
+        self.cars_per_lane_table: npt.NDArray[np.int64] = np.zeros((0, total_lanes), dtype=np.int64)
+
     def calculate_lane_probabilities(self) -> dict[int, float]:
         """Calculate the probability of spawning a car in each lane.
         The sum of all probabilities should be 1."""
         raise NotImplementedError
 
+    def extend_table(self, total_new_cars: int) -> None:
+        """Add the rows of the table up to the given number of new cars, at least doubling it"""
+
+        start = len(self.cars_per_lane_table)
+        new_cars = np.arange(start, max(total_new_cars + 1, 2 * start))
+
+        # Largest remainder method: every lane gets the whole part of its share, the cars that
+        # are left go to the lanes with the largest remainders, the lowest lane first on ties
+        shares = new_cars[:, None] * self.probabilities[None, :]
+        cars_per_lane = np.floor(shares).astype(np.int64)
+        left = new_cars - cars_per_lane.sum(axis=1)
+        order = np.argsort(cars_per_lane - shares, axis=1, kind="stable")
+        ranks = np.argsort(order, axis=1, kind="stable")
+        cars_per_lane += ranks < left[:, None]
+
+        self.cars_per_lane_table = np.vstack((self.cars_per_lane_table, cars_per_lane))
+
     def __call__(self, total_new_cars: int) -> list[int]:
         """Calculate the number of cars that should be spawned in each lane."""
-        cars_per_lane_unrounded = [
-            self.lane_probabilities[i] * total_new_cars for i in range(self.total_lanes)
-        ]
-        cars_per_lane_rounded = [round(i) for i in cars_per_lane_unrounded]
-
-        while sum(cars_per_lane_rounded) != total_new_cars:
-            # optimize the number of cars per lane based on the rounding error
-            differences_per_lane = [
-                i - j for i, j in zip(cars_per_lane_unrounded, cars_per_lane_rounded)
-            ]
-            if sum(cars_per_lane_rounded) > total_new_cars:
-                minimum_difference = min(differences_per_lane)
-                # If there are multiple lanes with the same minimum difference,
-                # choose the lane with the highest index
-                index = (self.total_lanes - 1) - differences_per_lane[::-1].index(
-                    minimum_difference
-                )
-                cars_per_lane_rounded[index] -= 1
-            else:
-                index = differences_per_lane.index(max(differences_per_lane))
-                cars_per_lane_rounded[index] += 1
-
-        return cars_per_lane_rounded
+
+        if self.sampling == "multinomial":
+            return self.rng.multinomial(total_new_cars, self.probabilities).tolist()
+
+        if total_new_cars >= len(self.cars_per_lane_table):
+            self.extend_table(total_new_cars)
+        return self.cars_per_lane_table[total_new_cars].tolist()
+
+    def assign_lanes(self, new_cars: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """Return the lane of every new car, for the numbers of new cars of consecutive steps.
+        The cars of a step are ordered by lane with the deterministic sampling."""
+
+        total_new_cars = int(new_cars.sum())
+
+        if self.sampling == "multinomial":
+            # Draw the lane of every car at once, by inverting the cumulative probabilities
+            lanes = np.searchsorted(
+                self.cumulative_probabilities, self.rng.random(total_new_cars), side="right"
+            )
+            return np.minimum(lanes, self.total_lanes - 1)
+
+        if len(new_cars) > 0 and new_cars.max() >= len(self.cars_per_lane_table):
+            self.extend_table(int(new_cars.max()))
+
+        # The k-th car of a step goes to the first lane whose cumulative number of cars
+        # in the table is larger than k
+        cumulative_cars = np.cumsum(self.cars_per_lane_table[new_cars], axis=1)
+        steps = np.repeat(np.arange(len(new_cars)), new_cars)
+        car_in_step = np.arange(total_new_cars) - np.repeat(
+            np.cumsum(new_cars) - new_cars, new_cars
+        )
+        return (car_in_step[:, None] >= cumulative_cars[steps]).sum(axis=1)
 
 
 LaneDistributionType = Type[LaneDistribution]
@@ -62,13 +114,19 @@ class SumSquaredLaneDistribution(LaneDistribution):
     """The probability of spawning a car in a lane is proportional
     to the sum of the squares of the lane indices."""
 
-    def __init__(self, total_lanes: int) -> None:
-        super().__init__(total_lanes)
-        self.squared_sum = sum([(i + 1) ** 2 for i in range(self.total_lanes)])
+    def __init__(
+        self,
+        total_lanes: int,
+        sampling: str = "deterministic",
+        rng: np.random.Generator | None = None,
+    ) -> None:
+        # The sum is needed for the lane probabilities, which are calculated by the base class
+        self.squared_sum = sum([(i + 1) ** 2 for i in range(total_lanes)])
+        super().__init__(total_lanes, sampling, rng)
 
     def calculate_lane_probabilities(self) -> dict[int, float]:
         p_i: Callable[[int], float] = (
-            lambda lane_index: (self.total_lanes - lane_index) / self.squared_sum
+            lambda lane_index: (self.total_lanes - lane_index) ** 2 / self.squared_sum
         )
         return {i: p_i(i) for i in range(self.total_lanes)}
 
@@ -107,19 +165,24 @@ lane_distributions = {
 }
 
 
-def lane_distribution_factory(total_lanes: int, lane_distribution_type: str) -> LaneDistribution:
+def lane_distribution_factory(
+    total_lanes: int,
+    lane_distribution_type: str,
+    sampling: str = "deterministic",
+    rng: np.random.Generator | None = None,
+) -> LaneDistribution:
     """Factory function for creating lane distributions based on the lane distribution type."""
 
     if lane_distribution_type == "triangle" or lane_distribution_type == "linear":
-        return TriangleLaneDistribution(total_lanes)
+        return TriangleLaneDistribution(total_lanes, sampling, rng)
     elif lane_distribution_type == "sum_squared":
-        return SumSquaredLaneDistribution(total_lanes)
+        return SumSquaredLaneDistribution(total_lanes, sampling, rng)
     elif lane_distribution_type == "equal":
-        return EqualLaneDistribution(total_lanes)
+        return EqualLaneDistribution(total_lanes, sampling, rng)
     elif lane_distribution_type == "all_in_first_lane":
-        return AllInFirstLaneDistribution(total_lanes)
+        return AllInFirstLaneDistribution(total_lanes, sampling, rng)
     elif lane_distribution_type == "all_in_last_lane":
-        return AllInLastLaneDistribution(total_lanes)
+        return AllInLastLaneDistribution(total_lanes, sampling, rng)
     else:
         raise ValueError(f"Unknown lane distribution type: {lane_distribution_type}")
 
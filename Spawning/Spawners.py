@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import Callable
 
 import numpy as np
+import numpy.typing as npt
 
 from Analysis.DataCollector import DataCollector
 from Road.Road import Road
@@ -11,17 +12,23 @@ from Spawning.LaneDistributions import lane_distribution_factory
 from Vehicles.Vehicle import Vehicle
 
 
-def poisson_new_cars(cars_per_second: float, delta_t: float) -> int:
-    """Calculate the number of new cars using a Poisson process."""
-    return np.random.default_rng().poisson(cars_per_second * delta_t)
+def poisson_new_cars(
+    cars_per_second: float, delta_t: float, rng: np.random.Generator, steps: int
+) -> npt.NDArray[np.int64]:
+    """Calculate the number of new cars in each of the steps using a Poisson process."""
+    return rng.poisson(cars_per_second * delta_t, size=steps)
 
 
-def uniform_new_cars(cars_per_second: float, delta_t: float) -> int:
-    """Calculate the number of new cars using a constant rate."""
-    return round(cars_per_second * delta_t)
+def uniform_new_cars(
+    cars_per_second: float, delta_t: float, rng: np.random.Generator, steps: int
+) -> npt.NDArray[np.int64]:
+    """Calculate the number of new cars in each of the steps using a constant rate."""
+    return np.full(steps, round(cars_per_second * delta_t), dtype=np.int64)
 
 
-new_cars_factory: dict[str, Callable[[float, float], int]] = {
+new_cars_factory: dict[
+    str, Callable[[float, float, np.random.Generator, int], npt.NDArray[np.int64]]
+] = {
     "poisson": poisson_new_cars,
     "equal": uniform_new_cars,
 }
@@ -33,42 +40,108 @@ spawn_process_types = {
 
 
 class VehicleSpawner:
-    """A vehicle spawner spawner."""
+    """A vehicle spawner spawner.
+    The arrivals are scheduled in advance for blocks of steps: the step and lane of every
+    arrival and, with a parameter sampler, the parameters of its vehicle. Spawning in a step
+    without arrivals is only a comparison with the step of the next arrival."""
 
     def __init__(
         self,
         spawn_process: str,
         lane_distribution_type: str,
-        vehicle_factory: Callable[[], Vehicle],
+        vehicle_factory: Callable[..., Vehicle],
         total_lanes: int,
         road: Road,
         data_collector: DataCollector,
         cars_per_second: float,
         time_step: float,
+        rng: np.random.Generator | None = None,
+        parameter_sampler: Callable[[int], dict[str, npt.NDArray[np.float64]]] | None = None,
+        schedule_steps: int = 10**4,
+        lane_sampling: str = "deterministic",
     ) -> None:
         self.new_cars_process = new_cars_factory[spawn_process]
+        # Generator of the arrivals and their lanes
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.lane_distribution = lane_distribution_factory(
-            total_lanes=total_lanes, lane_distribution_type=lane_distribution_type
+            total_lanes=total_lanes,
+            lane_distribution_type=lane_distribution_type,
+            sampling=lane_sampling,
+            rng=self.rng,
         )
+        # The vehicle factory is called with the parameters of the parameter sampler,
+        # which samples the parameters of the given number of vehicles at once.
+        # Without a parameter sampler the factory is called without arguments.
         self.vehicle_factory = vehicle_factory
+        self.parameter_sampler = parameter_sampler
         self.road = road
         self.data_collector = data_collector
         self.cars_per_second = cars_per_second
         self.time_step = time_step
 
-    def spawn(self, simulation_time: float) -> None:
-        """Spawn vehicles on the road."""
+        # Schedule of the arrivals in the current block of steps, which ends at schedule_end
+        self.schedule_steps: int = schedule_steps
+        self.schedule_end: int = 0
+        self.arrival_steps: list[int] = []
+        self.arrival_lanes: list[int] = []
+        self.arrival_parameters: list[dict[str, float]] = []
+        self.cursor: int = 0
+        # Step of the next arrival, or schedule_end if there are no more scheduled arrivals
+        self.next_arrival_step: int = 0
+        # Number of the current step, counted by spawn
+        self.step: int = 0
+
+    def schedule_arrivals(self) -> None:
+        """Schedule the arrivals of the next block of steps"""
+
+        schedule_start = self.schedule_end
+        self.schedule_end = schedule_start + self.schedule_steps
+
+        num_new_cars = self.new_cars_process(
+            self.cars_per_second, self.time_step, self.rng, self.schedule_steps
+        )
+        steps = np.flatnonzero(num_new_cars)
+
+        self.arrival_steps = np.repeat(steps + schedule_start, num_new_cars[steps]).tolist()
+        self.arrival_lanes = self.lane_distribution.assign_lanes(num_new_cars[steps]).tolist()
+        if self.parameter_sampler is not None:
+            parameters = {
+                name: values.tolist()
+                for name, values in self.parameter_sampler(len(self.arrival_steps)).items()
+            }
+            self.arrival_parameters = [
+                dict(zip(parameters, values)) for values in zip(*parameters.values())
+            ]
+
+        self.cursor = 0
+        self.next_arrival_step = self.arrival_steps[0] if self.arrival_steps else self.schedule_end
 
-        num_new_cars = self.new_cars_process(self.cars_per_second, self.time_step)
+    def spawn(self, simulation_time: float) -> None:
+        """Spawn vehicles on the road, called once at every step."""
 
-        cars_per_lane = self.lane_distribution(num_new_cars)
+        if self.step == self.next_arrival_step:
+            if self.step == self.schedule_end:
+                self.schedule_arrivals()
 
-        for lane_index, num_new_cars_per_lane in enumerate(cars_per_lane):
-            for _ in range(num_new_cars_per_lane):
-                vehicle = self.vehicle_factory()
+            while self.cursor < len(self.arrival_steps) and (
+                self.arrival_steps[self.cursor] == self.step
+            ):
+                if self.parameter_sampler is not None:
+                    vehicle = self.vehicle_factory(**self.arrival_parameters[self.cursor])
+                else:
+                    vehicle = self.vehicle_factory()
 
                 self.road.add_vehicle(
                     vehicle=vehicle,
-                    lane_index=lane_index,
+                    lane_index=self.arrival_lanes[self.cursor],
                 )
                 self.data_collector.vehicle_added(vehicle, simulation_time)
+                self.cursor += 1
+
+            self.next_arrival_step = (
+                self.arrival_steps[self.cursor]
+                if self.cursor < len(self.arrival_steps)
+                else self.schedule_end
+            )
+
+        self.step += 1
@@ -7,15 +7,16 @@ from Behaviors.SimpleBehavior import SimpleFollowingExtendedBehavior
 from Vehicles.Vehicle import Vehicle
 
 
-def simple_vehicle_factory() -> Vehicle:
-    """Create a vehicle with a simple behavior model."""
+def simple_vehicle_factory(rng: np.random.Generator) -> Vehicle:
+    """Create a vehicle with a simple behavior model, with random numbers from the generator."""
     # get desired_velocity from a normal distribution with mean 100 km/h and std 4 km/h
-    desired_velocity = np.random.normal(100 / 3.6, 8 / 3.6)
+    desired_velocity = rng.normal(100 / 3.6, 8 / 3.6)
 
     return Vehicle(
         position=0,
         behavior_model=SimpleFollowingExtendedBehavior(
             desired_velocity=desired_velocity,  # m/s
             save_time=2,  # s
+            rng=rng,
         ),
     )
@@ -8,30 +8,50 @@ from Road.Road import Road
 class Vehicle:
     """A vehicle class that contains a behavior model and a position on the road."""
 
+    __slots__ = (
+        "id",
+        "behavior_model",
+        "position",
+        "velocity",
+        "previous_position",
+        "previous_velocity",
+    )
+
+    # The dimensions are the same for all vehicles
+    width: float = 0.5
+    length: float = 1.5
+
     def __init__(self, behavior_model: Behavior, position: float = 0) -> None:
         self.id = self.get_next_id()
 
         self.behavior_model: Behavior = behavior_model
-        self.width: float = 0.5
-        self.length: float = 1.5
 
         self.position: float = position
         self.velocity: float = 0
         self.behavior_model.set_initial_velocity(self)
 
+        # Position and velocity before the last move
+        self.previous_position: float = position
         self.previous_velocity: float = 0
 
     def update(self, road: Road, delta_t: float) -> None:
         """Update the vehicle's state and position."""
 
-        self.previous_velocity = self.velocity
-        self.position += self.velocity * delta_t
+        self.move(road=road, delta_t=delta_t)
         self.behavior_model.update(
             vehicle=self,
             road=road,
             delta_t=delta_t,
         )
 
+    def move(self, road: Road, delta_t: float) -> None:
+        """Move the vehicle with its current velocity."""
+
+        self.previous_position = self.position
+        self.previous_velocity = self.velocity
+        self.position += self.velocity * delta_t
+        road.update_vehicle_position(self)
+
     @classmethod
     def get_next_id(cls):
         """Return the next available ID."""
@@ -41,3 +61,9 @@ class Vehicle:
         else:
             cls._id_counter += 1
         return cls._id_counter
+
+    @classmethod
+    def reset_id_counter(cls) -> None:
+        """Let the IDs start at 1 again, for a new simulation."""
+
+        cls._id_counter = 0
@@ -0,0 +1,71 @@
+# type: ignore
+import os
+from tkinter.filedialog import askdirectory
+
+import matplotlib.pyplot as plt
+from tqdm import tqdm
+
+from Analysis.StreamingStatistics import merge_statistics, read_statistics
+from run_multiple import open_simulation
+
+# Ask for folder
+tmpfolder = askdirectory(title="Select folder with simulation results", initialdir=os.getcwd())
+
+# Travel time statistics of every simulation, per behavior and cars per second
+# Simulations with the same settings (replicas) are merged
+statistics = {}
+
+folder_list = [f.path for f in os.scandir(tmpfolder) if f.is_dir()]
+for folder in tqdm(folder_list):
+    _, _, simulation_settings = open_simulation(
+        preference_file="simulation_settings.json", folder=folder
+    )
+    simulation_statistics = read_statistics(folder)
+    if simulation_statistics is None:
+        print(f"No travel time statistics in {folder}")
+        continue
+
+    behavior = simulation_settings["vehicle"]["behavior"][0]
+    cars_per_second = simulation_settings["spawn"]["cars_per_second"]
+    statistics.setdefault(behavior, {}).setdefault(cars_per_second, []).append(
+        simulation_statistics
+    )
+
+# Merge the replicas, only the statistics are merged, the travel times are not read
+summaries = {
+    behavior: {
+        cars_per_second: merge_statistics(replicas).summary()
+        for cars_per_second, replicas in sorted(per_cps.items())
+    }
+    for behavior, per_cps in statistics.items()
+}
+
+for behavior, per_cps in summaries.items():
+    print(f"{behavior}:")
+    for cars_per_second, summary in per_cps.items():
+        print(
+            f"\t{cars_per_second} cars per second: {summary['count']} cars, "
+            f"mean {summary['mean']:.2f} s, p50 {summary['p50']:.2f} s, "
+            f"p90 {summary['p90']:.2f} s, p99 {summary['p99']:.2f} s"
+        )
+
+# Plot the results
+plt.figure(figsize=(10, 5))
+plt.title("Travel times of the simulations")
+plt.xlabel("Cars per second")
+plt.ylabel("Travel time (s)")
+for behavior, per_cps in summaries.items():
+    cps = list(per_cps)
+    median = plt.plot(cps, [summary["p50"] for summary in per_cps.values()], label=behavior)
+    plt.fill_between(
+        cps,
+        [summary["p90"] for summary in per_cps.values()],
+        [summary["p50"] for summary in per_cps.values()],
+        color=median[0].get_color(),
+        alpha=0.2,
+    )
+plt.legend(title="Median, up to the 90th percentile")
+plt.grid()
+plt.ylim(bottom=0)
+plt.savefig(os.path.join(tmpfolder, "travel_times.png"))
+plt.show()
@@ -3,10 +3,10 @@ import os
 from tkinter.filedialog import askdirectory
 
 import numpy as np
-import pandas as pd
 from tqdm import tqdm
 
 from Analysis.AnalyseVehicleData import analyse_vehicle_data
+from Analysis.DataReader import read_data
 from run_multiple import open_simulation
 
 # Ask for folder
@@ -28,8 +28,8 @@ simulation = open_simulation(preference_file="vehicle_data.csv", folder=folder)
 
 print("Reading data...")
 
-# Read the data from the file, ignore the first row which is a header
-data = pd.read_csv(simulation[0], header=0)
+# Read the data from the CSV file or the binary dataset
+data = read_data(simulation[0])
 vehicles_ids = data["vehicle_id"].unique()
 
 min_vehicle_id = min(vehicles_ids)
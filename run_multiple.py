@@ -1,13 +1,26 @@
 # type: ignore
+import contextlib
+import copy
+import hashlib
 import json
 import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from typing import Any
 
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
 from tqdm import tqdm
 
 from Analysis.AnalyseRoadRush import analyse_road_rush
 from Analysis.AnalyseTravelTimes import analyse_travel_times
-from simulation import simulate
+from Analysis.DataReader import data_exists
+from Analysis.Metrics import METRICS_FILE
+from Analysis.StreamingStatistics import read_statistics
+from simulation import fill_default_settings, simulate
 
 
 def open_simulation(preference_file: str, folder: str) -> tuple[str, str, dict[str, Any]]:
@@ -27,7 +40,7 @@ def open_simulation(preference_file: str, folder: str) -> tuple[str, str, dict[s
         simulation_settings = json.load(file)
 
     preference_file_path = os.path.join(folder, preference_file)
-    if not os.path.exists(preference_file_path):
+    if not data_exists(preference_file_path):
         raise FileNotFoundError(f"File {preference_file_path} does not exist.")
 
     print("Opening preference file...")
@@ -108,23 +121,248 @@ def return_simulations_array(length, lanes, duration, cars_per_second) -> list[d
     return simulations
 
 
+# File in the folder of a sweep with the state of every run of the sweep
+MANIFEST_FILE = "manifest.json"
+# Run states in the manifest, a run that isn't done is run again when the sweep is resumed,
+# also when only its analyses failed
+run_states = ("pending", "running", "done", "failed", "analysis failed")
+
+
+def settings_key(simulation: dict[str, Any]) -> str:
+    """Return a stable key of the settings, the hash of all settings except the name
+    and the process information that a simulation adds.
+    The settings should have their defaults filled in, see resolve_settings."""
+
+    settings = {key: value for key, value in simulation.items() if key not in ("name", "process")}
+    text = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def resolve_settings(simulation: dict[str, Any]) -> dict[str, Any]:
+    """Return a copy of the settings with the defaults of the simulation and a seed.
+    Without a seed in the settings the seed is derived from the other settings, so the same
+    settings always resolve to the same run, whether the defaults are written out or not.
+    Replicas of a simulation need different seeds."""
+
+    resolved = fill_default_settings(copy.deepcopy(simulation))
+    if resolved["simulation"].get("seed") is None:
+        resolved["simulation"]["seed"] = int(settings_key(resolved)[:8], 16)
+    return resolved
+
+
+class SweepManifest:
+    """The state, folder and summary of every run of a sweep by settings key,
+    stored in the manifest file of the sweep folder"""
+
+    def __init__(self, folder: str) -> None:
+        os.makedirs(folder, exist_ok=True)
+        self.path: str = os.path.join(folder, MANIFEST_FILE)
+        self.runs: dict[str, dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.runs = json.load(file)
+
+    def set_state(self, key: str, state: str, **details: Any) -> None:
+        """Set the state of a run and its details, and write the manifest"""
+
+        if state not in run_states:
+            raise ValueError(f"Unknown run state: {state}")
+        self.runs.setdefault(key, {}).update(state=state, **details)
+        self.write()
+
+    def is_complete(self, key: str) -> bool:
+        """Return whether the run is done and its data still exists"""
+
+        run = self.runs.get(key)
+        return (
+            run is not None
+            and run["state"] == "done"
+            and os.path.exists(os.path.join(run["folder"], "simulation_settings.json"))
+        )
+
+    def write(self) -> None:
+        """Write the manifest, replacing the old one at once so it's never half written"""
+
+        with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self.runs, file, indent=4)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def start_worker() -> None:
+    """Prepare a process for running simulations: plots are only saved, never shown.
+    The random numbers of a simulation all come from the seed in its settings."""
+
+    matplotlib.use("Agg")
+
+
+def run_simulation(
+    simulation: dict[str, Any], analyse: bool = True, folder: str | None = None
+) -> dict[str, Any]:
+    """Run a simulation followed by its analyses and return a summary of the run.
+    The data is stored in the folder, or in a new folder in tmp if None.
+    Errors don't stop a sweep, they are noted in the summary.
+    The output of the simulation and the analyses is hidden."""
+
+    summary = {
+        "id": simulation["name"]["id"],
+        "behavior": simulation["vehicle"]["behavior"][0],
+        "cars_per_second": simulation["spawn"]["cars_per_second"],
+        "lanes": simulation["road"]["lanes"],
+        "length": simulation["road"]["length"],
+        "duration": simulation["simulation"]["duration"],
+        "seed": simulation["simulation"].get("seed"),
+        "status": "done",
+        "error": None,
+    }
+
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            folder = simulate(simulation, progress=False, folder=folder)
+        except Exception:  # pylint: disable=broad-except
+            summary.update(
+                status="failed",
+                seed=simulation["simulation"].get("seed"),
+                error=traceback.format_exc(),
+            )
+            return summary
+        # Without a seed in the settings the simulation draws one and stores it in the settings
+        summary["seed"] = simulation["simulation"]["seed"]
+        summary["folder"] = folder
+        summary["runtime"] = simulation["process"]["runtime"]
+
+        if analyse:
+            try:
+                analyse_travel_times(
+                    False,
+                    False,
+                    open_simulation(preference_file="travel_times.csv", folder=folder),
+                )
+                # The road rush is analysed from the metrics if the simulation wrote them,
+                # a simulation with only the metrics has no vehicle data
+                has_metrics = os.path.exists(os.path.join(folder, METRICS_FILE))
+                analyse_road_rush(
+                    False,
+                    False,
+                    open_simulation(
+                        preference_file=METRICS_FILE if has_metrics else "vehicle_data.csv",
+                        folder=folder,
+                    ),
+                )
+            except Exception:  # pylint: disable=broad-except
+                summary.update(status="analysis failed", error=traceback.format_exc())
+            finally:
+                # The analyses don't close their figures
+                plt.close("all")
+    summary["total_runtime"] = time.perf_counter() - start
+
+    statistics = read_statistics(folder)
+    if statistics is not None:
+        for name, value in statistics.summary().items():
+            summary[f"travel_time_{name}"] = value
+
+    return summary
+
+
+def run_sweep(
+    simulations: list[dict[str, Any]],
+    workers: int | None = None,
+    analyse: bool = True,
+    results_file: str | None = None,
+    sweep_folder: str | None = None,
+) -> pd.DataFrame:
+    """Run the simulations, each followed by its analyses, in a pool of worker processes
+    (all cores if workers is None) and return a table with the summary of every run.
+    The table is written to the results file, if given, after every finished run.
+
+    With a sweep folder the sweep can be resumed: every run is stored in a folder named after
+    the key of its resolved settings, and the manifest of the sweep folder records the state
+    of every run. Runs that are done are skipped, so an interrupted or extended sweep
+    only runs what is missing."""
+
+    workers = workers or os.cpu_count() or 1
+    summaries = []
+    manifest = SweepManifest(sweep_folder) if sweep_folder is not None else None
+
+    # Runs to do, as (settings key, settings, folder)
+    runs: list[tuple[str | None, dict[str, Any], str | None]] = []
+    if manifest is None:
+        runs = [(None, simulation, None) for simulation in simulations]
+    else:
+        for simulation in map(resolve_settings, simulations):
+            key = settings_key(simulation)
+            if manifest.is_complete(key):
+                summaries.append(manifest.runs[key]["summary"])
+            elif all(key != other for other, _, _ in runs):
+                folder = os.path.join(sweep_folder, f"{simulation['name']['id']}_{key}")
+                manifest.runs[key] = {"state": "pending", "folder": folder, "settings": simulation}
+                runs.append((key, simulation, folder))
+        manifest.write()
+        print(f"{len(summaries)} runs done, {len(runs)} runs to do")
+
+    def finish_run(key: str | None, summary: dict[str, Any]) -> None:
+        summary["key"] = key
+        summaries.append(summary)
+        if summary["status"] != "done":
+            tqdm.write(f"{summary['id']} {summary['status']}:\n{summary['error']}")
+        if manifest is not None:
+            manifest.set_state(key, summary["status"], summary=summary)
+        if results_file is not None:
+            pd.DataFrame(summaries).to_csv(results_file, index=False)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker) as executor:
+        # Only as many runs as there are workers are handed to the pool,
+        # so the runs that are running in the manifest are really running
+        pending = iter(runs)
+        running = {}
+
+        def start_run() -> None:
+            run = next(pending, None)
+            if run is None:
+                return
+            key, simulation, folder = run
+            if manifest is not None:
+                # Remove the data of an unfinished earlier attempt
+                shutil.rmtree(folder, ignore_errors=True)
+                manifest.set_state(key, "running")
+            running[executor.submit(run_simulation, simulation, analyse, folder)] = key
+
+        for _ in range(workers):
+            start_run()
+
+        with tqdm(total=len(runs), unit="run") as progress:
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish_run(running.pop(future), future.result())
+                    progress.update()
+                    start_run()
+
+    results = pd.DataFrame(summaries)
+    if results.empty:
+        return results
+    return results.sort_values(["behavior", "cars_per_second"], ignore_index=True)
+
+
 def run_multiple():
     LENGTH = 5000
     LANES = 3
     DURATION = 36000
+    # Number of simulations that run at the same time, all cores if None
+    WORKERS = None
+    # The runs of the sweep are stored here, running the sweep again skips the finished runs
+    SWEEP_FOLDER = os.path.join(os.getcwd(), "tmp", "sweep")
     simulations = []
 
     for cars_per_second in [0.01]:
         simulations.extend(return_simulations_array(LENGTH, LANES, DURATION, cars_per_second))
 
-    for simulation in tqdm(simulations):
-        folder = simulate(simulation)
-        analyse_travel_times(
-            False, False, open_simulation(preference_file="travel_times.csv", folder=folder)
-        )
-        analyse_road_rush(
-            False, False, open_simulation(preference_file="vehicle_data.csv", folder=folder)
-        )
+    results_file = os.path.join(SWEEP_FOLDER, "sweep_results.csv")
+    results = run_sweep(
+        simulations, workers=WORKERS, results_file=results_file, sweep_folder=SWEEP_FOLDER
+    )
+    results.to_csv(results_file, index=False)
+    print(results.drop(columns=["error", "folder"], errors="ignore").to_string())
 
 
 if __name__ == "__main__":
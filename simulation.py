@@ -4,6 +4,7 @@ import time
 from typing import Callable
 
 import numpy as np
+import numpy.typing as npt
 from tqdm import tqdm
 
 # pylint: disable=wrong-import-position
@@ -15,8 +16,12 @@ if __name__ == "__main__":
 # pylint: enable=wrong-import-position
 
 from Analysis.DataCollector import DataCollector
+from Analysis.Detectors import detectors_factory
+from Analysis.RecordingPolicies import recording_policy_factory
 from Behaviors.Behaviors import behavior_options
 from GUI.set_simulation_settings_gui import get_simulation_settings
+from Road.ArrayLane import ArrayLane
+from Road.ArrayRoad import ArrayRoad
 from Road.Lane import Lane
 from Road.Road import Road
 from Spawning.LaneDistributions import (
@@ -28,8 +33,129 @@ from Spawning.Spawners import VehicleSpawner
 from Vehicles.Vehicle import Vehicle
 
 
-def simulate(simulation=None):
-    """Simulate the traffic."""
+def delete_exited_vehicles(
+    road: Road, data_collector: DataCollector, simulation_time: float
+) -> None:
+    """Remove the vehicles that have left the road"""
+
+    for lane_index, lane in road.lanes.items():
+        while (len(lane.vehicles)) > 0 and (lane.vehicles[0].position > road.length):
+            data_collector.vehicle_deleted(lane.vehicles[0], simulation_time)
+            road.delete_first_vehicle(lane_index)
+
+
+def step_object_engine(
+    road: Road, data_collector: DataCollector, time_step: float, simulation_time: float
+) -> None:
+    """Advance the simulation one step by updating every vehicle object one at a time.
+    This is the reference engine."""
+
+    # Update all vehicles
+    for lane_index, lane in road.lanes.items():
+        for vehicle in lane.vehicles:
+            # Update the vehicle
+            vehicle.update(road=road, delta_t=time_step)
+
+            # Collect data for the vehicle
+            data_collector.collect_data(vehicle=vehicle, lane_index=lane_index)
+
+    delete_exited_vehicles(road, data_collector, simulation_time)
+
+
+def step_synchronous_engine(
+    road: Road, data_collector: DataCollector, time_step: float, simulation_time: float
+) -> None:
+    """Advance the simulation one step in two phases, so the result does not depend on
+    the order in which the vehicles are updated.
+    First all lane changes are decided on the same state of the road and applied at once,
+    then every new velocity is calculated from the old velocities before any of them is set."""
+
+    vehicles = [vehicle for lane in road.lanes.values() for vehicle in lane.vehicles]
+
+    # Move all vehicles with their current velocity
+    for vehicle in vehicles:
+        vehicle.move(road=road, delta_t=time_step)
+
+    # Decide on all lane changes before changing any lane
+    changed_ids = road.change_lanes()
+
+    # Calculate all new velocities before setting any of them
+    velocities = [
+        vehicle.behavior_model.next_velocity(
+            vehicle, road, time_step, changed_lane=vehicle.id in changed_ids
+        )
+        for vehicle in vehicles
+    ]
+    for vehicle, velocity in zip(vehicles, velocities):
+        vehicle.velocity = velocity
+
+    # Collect data for all vehicles
+    for lane_index, lane in road.lanes.items():
+        for vehicle in lane.vehicles:
+            data_collector.collect_data(vehicle=vehicle, lane_index=lane_index)
+
+    delete_exited_vehicles(road, data_collector, simulation_time)
+
+
+def step_vectorized_engine(
+    road: ArrayRoad, data_collector: DataCollector, time_step: float, simulation_time: float
+) -> None:
+    """Advance the simulation one step by updating all vehicles of a lane in one batched step."""
+
+    # Update all vehicles
+    road.update(delta_t=time_step)
+
+    # Collect data for all vehicles of each lane
+    for lane_index, lane in road.lanes.items():
+        data_collector.collect_lane(
+            lane_index=lane_index,
+            vehicle_ids=lane.ids,
+            positions=lane.positions,
+            velocities=lane.velocities,
+            previous_positions=lane.previous_positions,
+        )
+
+    # Remove vehicles that have left the road
+    for vehicle in road.delete_exited_vehicles():
+        data_collector.vehicle_deleted(vehicle, simulation_time)
+
+
+simulation_engines = {
+    "object": step_object_engine,
+    "synchronous": step_synchronous_engine,
+    "vectorized": step_vectorized_engine,
+}
+
+# Values of the optional settings when they are left out, by section of the settings
+default_settings = {
+    "simulation": {
+        "engine": "object",
+        "output_format": "csv",
+        "asynchronous_export": False,
+        "max_pending_exports": 2,
+        "metrics_only": False,
+    },
+    "spawn": {"lane_sampling": "deterministic"},
+    "recording": {},
+    "detectors": {},
+}
+
+
+def fill_default_settings(simulation: dict) -> dict:
+    """Add the default value of every optional setting that is left out to the settings
+    and return them, so equal simulations have equal settings however they are written"""
+
+    for section, defaults in default_settings.items():
+        settings = simulation.setdefault(section, {})
+        for key, value in defaults.items():
+            settings.setdefault(key, value)
+    return simulation
+
+
+def simulate(simulation=None, progress: bool = True, folder: str | None = None):
+    """Simulate the traffic.
+    Without progress there is no progress bar, e.g. for simulations in parallel.
+    The data is stored in the folder, or in a new folder in tmp if None."""
     if simulation is None:
         print("Getting simulation settings")
         simulation = get_simulation_settings()
@@ -37,10 +163,61 @@ def simulate(simulation=None):
 
     print("Storing simulation settings")
 
-    datacollector = DataCollector(simulation["name"]["id"])
+    fill_default_settings(simulation)
+    engine = simulation["simulation"]["engine"]
+    if engine not in simulation_engines:
+        raise ValueError(f"Unknown simulation engine: {engine}")
 
-    def create_road() -> Road:
-        road = Road(length=simulation["road"]["length"])
+    behavior = behavior_options[simulation["vehicle"]["behavior"][0]]
+    # Only the object engine asks every vehicle for its lane change,
+    # the other engines decide all lane changes at once with the default rule
+    if engine != "object" and not behavior.has_default_lane_changes():
+        raise ValueError(
+            f"The {engine} engine does not support the lane changes of {behavior.__name__}"
+        )
+
+    datacollector = DataCollector(
+        simulation["name"]["id"],
+        output_format=simulation["simulation"]["output_format"],
+        asynchronous_export=simulation["simulation"]["asynchronous_export"],
+        max_pending_exports=simulation["simulation"]["max_pending_exports"],
+        recording_policies=recording_policy_factory(simulation["recording"]),
+        record_vehicle_data=not simulation["simulation"]["metrics_only"],
+        detectors=detectors_factory(
+            simulation["detectors"],
+            lanes=simulation["road"]["lanes"],
+            time_step=simulation["simulation"]["time_step"],
+        ),
+        path=folder,
+    )
+
+    # All random numbers come from the seed of the settings. Without a seed a new seed is drawn
+    # and stored in the settings, so every simulation can be reproduced from its settings.
+    if simulation["simulation"].get("seed") is None:
+        simulation["simulation"]["seed"] = np.random.SeedSequence().entropy
+    # Separate streams for the arrivals, the vehicle parameters and the driving, so a change
+    # in how often one of them draws doesn't change the random numbers of the others
+    arrival_rng, vehicle_rng, rng = (
+        np.random.default_rng(seed)
+        for seed in np.random.SeedSequence(simulation["simulation"]["seed"]).spawn(3)
+    )
+    # The vehicle IDs start at 1 in every simulation, because the probe vehicles of
+    # the recording depend on them
+    Vehicle.reset_id_counter()
+
+    def create_road() -> Road | ArrayRoad:
+        if engine == "vectorized":
+            road = ArrayRoad(
+                length=simulation["road"]["length"],
+                behavior=behavior,
+                rng=rng,
+                data_collector=datacollector,
+            )
+            for _ in range(simulation["road"]["lanes"]):
+                road.add_lane(lane=ArrayLane(behavior=behavior))
+            return road
+
+        road = Road(length=simulation["road"]["length"], data_collector=datacollector)
 
         for _ in range(simulation["road"]["lanes"]):
             road.add_lane(lane=Lane())
@@ -49,32 +226,41 @@ def simulate(simulation=None):
 
     road = create_road()
 
-    def create_vehicle_factory() -> Callable[[], Vehicle]:
-        behavior = behavior_options[simulation["vehicle"]["behavior"][0]]
-
-        def vehicle_factory() -> Vehicle:
-            desired_velocity = max(
-                np.random.normal(
-                    loc=simulation["vehicle"]["behavior_settings"][0],
-                    scale=simulation["vehicle"]["behavior_settings"][1],
-                ),
-                0.01,
-            )  # Velocity can't be 0 or negative
-
-            behavior_parameters = {
-                parameter: max(np.random.normal(value["mu"], value["sigma"]), 0.01)
-                for parameter, value in simulation["vehicle"]["behavior"][1].items()
+    def create_parameter_sampler(
+        vehicle_rng: np.random.Generator,
+    ) -> Callable[[int], dict[str, npt.NDArray[np.float64]]]:
+        def sample_parameters(count: int) -> dict[str, npt.NDArray[np.float64]]:
+            """Sample the behavior parameters of the given number of vehicles"""
+
+            # Velocity can't be 0 or negative
+            parameters = {
+                "desired_velocity": np.maximum(
+                    vehicle_rng.normal(
+                        loc=simulation["vehicle"]["behavior_settings"][0],
+                        scale=simulation["vehicle"]["behavior_settings"][1],
+                        size=count,
+                    ),
+                    0.01,
+                )
             }
-            behavior_parameters["desired_velocity"] = desired_velocity
+            for parameter, value in simulation["vehicle"]["behavior"][1].items():
+                parameters[parameter] = np.maximum(
+                    vehicle_rng.normal(value["mu"], value["sigma"], size=count), 0.01
+                )
+            return parameters
 
+        return sample_parameters
+
+    def create_vehicle_factory(behavior_rng: np.random.Generator) -> Callable[..., Vehicle]:
+        def vehicle_factory(**behavior_parameters: float) -> Vehicle:
             return Vehicle(
                 position=0,
-                behavior_model=behavior(**behavior_parameters),
+                behavior_model=behavior(**behavior_parameters, rng=behavior_rng),
             )
 
         return vehicle_factory
 
-    vehicle_factory = create_vehicle_factory()
+    vehicle_factory = create_vehicle_factory(rng)
 
     vehicle_spawner = VehicleSpawner(
         spawn_process=simulation["spawn"]["process"],
@@ -85,35 +271,27 @@ def simulate(simulation=None):
         data_collector=datacollector,
         cars_per_second=simulation["spawn"]["cars_per_second"],
         time_step=simulation["simulation"]["time_step"],
+        rng=arrival_rng,
+        parameter_sampler=create_parameter_sampler(vehicle_rng),
+        lane_sampling=simulation["spawn"]["lane_sampling"],
     )
 
     simulation_time = 0
     time_step = simulation["simulation"]["time_step"]
+    simulation_step_function = simulation_engines[engine]
     steps = int(simulation["simulation"]["duration"] / simulation["simulation"]["time_step"])
 
     with datacollector as data_collector:
         start = time.perf_counter_ns()
-        for simulation_step in tqdm(range(steps)):
+        for simulation_step in tqdm(range(steps), disable=not progress):
             simulation_time = time_step * simulation_step
             data_collector.set_new_simulation_time(simulation_time)
 
             # Spawn new vehicles
             vehicle_spawner.spawn(simulation_time)
 
-            # Update all vehicles
-            for lane_index, lane in road.lanes.items():
-                for vehicle in lane.vehicles:
-                    # Update the vehicle
-                    vehicle.update(road=road, delta_t=time_step)
-
-                    # Collect data for the vehicle
-                    data_collector.collect_data(vehicle=vehicle, lane_index=lane_index)
-
-            for lane_index, lane in road.lanes.items():
-                # Remove vehicles that have left the road
-                while (len(lane.vehicles)) > 0 and (lane.vehicles[0].position > road.length):
-                    data_collector.vehicle_deleted(lane.vehicles[0], simulation_time)
-                    road.delete_vehicle(lane.vehicles[0])
+            # Update all vehicles, collect their data and remove the ones that left the road
+            simulation_step_function(road, data_collector, time_step, simulation_time)
 
         # Simulation end
         end = time.perf_counter_ns()
@@ -124,6 +302,9 @@ def simulate(simulation=None):
     }
     print(f"Simulation took {simulation['process']['runtime']:.2f} seconds")
 
+    # Note what was recorded, so the analyses know how the data is sampled
+    simulation["recording"] = data_collector.recording_settings()
+
     # Add extra data to the data file
     data_collector.add_extra_data(simulation)
 
@@ -12,6 +12,6 @@ p = 0.1
 folder_list = [f.path for f in os.scandir(tmpfolder) if f.is_dir() and f"_3_{p}_3600" in f.path]
 simulations = []
 for folder in folder_list:
-    simulations.append(open_simulation(preference_file="vehicle_data.csv", folder=folder))
+    simulations.append(open_simulation(preference_file="lane_changes.csv", folder=folder))
 
 analyse_lane_changes(False, True, simulations=simulations)